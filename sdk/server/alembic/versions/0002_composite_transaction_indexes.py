@@ -0,0 +1,38 @@
+"""
+Replace single-column gateway/status indexes with composite and partial indexes
+"""
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    # Listing filters by gateway and/or status and orders by created_at
+    op.create_index(
+        'ix_tx_gateway_status_created', 'transactions', ['gateway', 'status', 'created_at']
+    )
+    op.create_index('ix_tx_status_created', 'transactions', ['status', 'created_at'])
+    # Small index over the pending backlog only
+    op.create_index(
+        'ix_tx_pending_created', 'transactions', ['created_at'],
+        postgresql_where=sa.text("status = 'pending'")
+    )
+    # Webhooks look transactions up by the gateway's id
+    op.create_index('ix_tx_gateway_transaction_id', 'transactions', ['gateway_transaction_id'])
+
+    # Covered by the composite indexes above as a prefix
+    op.drop_index('ix_transactions_gateway', table_name='transactions')
+    op.drop_index('ix_transactions_status', table_name='transactions')
+
+def downgrade():
+    op.create_index('ix_transactions_status', 'transactions', ['status'])
+    op.create_index('ix_transactions_gateway', 'transactions', ['gateway'])
+
+    op.drop_index('ix_tx_gateway_transaction_id', table_name='transactions')
+    op.drop_index('ix_tx_pending_created', table_name='transactions')
+    op.drop_index('ix_tx_status_created', table_name='transactions')
+    op.drop_index('ix_tx_gateway_status_created', table_name='transactions')
@@ -0,0 +1,26 @@
+"""
+Store transaction amounts as integer cents
+"""
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    op.add_column('transactions', sa.Column('amount_cents', sa.BigInteger, nullable=True))
+    op.execute("UPDATE transactions SET amount_cents = ROUND(amount * 100)")
+    op.alter_column('transactions', 'amount_cents', nullable=False)
+    op.drop_column('transactions', 'amount')
+
+def downgrade():
+    op.add_column(
+        'transactions',
+        sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=True)
+    )
+    op.execute("UPDATE transactions SET amount = amount_cents / 100.0")
+    op.alter_column('transactions', 'amount', nullable=False)
+    op.drop_column('transactions', 'amount_cents')
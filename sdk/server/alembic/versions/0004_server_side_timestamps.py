@@ -0,0 +1,33 @@
+"""
+Store transaction timestamps as timestamptz set by the database clock
+"""
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    # Existing values were written with datetime.utcnow()
+    op.execute("UPDATE transactions SET updated_at = created_at WHERE updated_at IS NULL")
+    for column in ('created_at', 'updated_at'):
+        op.alter_column(
+            'transactions', column,
+            type_=sa.DateTime(timezone=True),
+            postgresql_using=f"{column} AT TIME ZONE 'UTC'",
+            server_default=sa.func.now(),
+            nullable=False
+        )
+
+def downgrade():
+    for column in ('created_at', 'updated_at'):
+        op.alter_column(
+            'transactions', column,
+            type_=sa.DateTime(),
+            postgresql_using=f"{column} AT TIME ZONE 'UTC'",
+            server_default=None
+        )
+    op.alter_column('transactions', 'updated_at', nullable=True)
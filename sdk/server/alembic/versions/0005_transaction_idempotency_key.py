@@ -0,0 +1,23 @@
+"""
+Store the client idempotency key of each transaction, unique per gateway
+"""
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    op.add_column('transactions', sa.Column('idempotency_key', sa.String(), nullable=True))
+    # NULL keys are distinct, so requests without a key are not constrained
+    op.create_index(
+        'uq_tx_gateway_idempotency_key', 'transactions', ['gateway', 'idempotency_key'],
+        unique=True
+    )
+
+def downgrade():
+    op.drop_index('uq_tx_gateway_idempotency_key', table_name='transactions')
+    op.drop_column('transactions', 'idempotency_key')
@@ -1,27 +1,95 @@
 """Authentication and authorization utilities."""
 
+import hashlib
+import hmac
 import os
+from typing import Iterable, Set
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
 from sdk.server.schemas.exceptions import AuthenticationException
 
 
 # Default API key for demo purposes - should be stored securely in production
 DEFAULT_API_KEY = os.getenv("API_KEY", "demo-api-key-12345")
 
+# Keys are compared by SHA-256 digest so the comparison is constant-time
+# regardless of the length of the provided key
+_EXPECTED_KEY_DIGEST = hashlib.sha256(DEFAULT_API_KEY.encode("utf-8")).digest()
+
+# Keys that have already passed verification. Only the configured key can
+# ever be added, so caller-supplied strings (e.g. from credential stuffing)
+# are never retained and cannot evict it
+_VERIFIED_KEYS: Set[str] = set()
+
+
+def _is_valid_api_key(api_key: str) -> bool:
+    """Check an API key against the configured key, caching a success."""
+    if api_key in _VERIFIED_KEYS:
+        return True
+
+    digest = hashlib.sha256(api_key.encode("utf-8")).digest()
+    if not hmac.compare_digest(digest, _EXPECTED_KEY_DIGEST):
+        return False
+
+    _VERIFIED_KEYS.add(api_key)
+    return True
+
 
 def verify_api_key(api_key: str = None):
     """
     Verify API key for authentication.
-    
+
     Args:
         api_key: API key to verify
-        
+
     Raises:
         AuthenticationException: If API key is invalid or missing
     """
     if not api_key:
         raise AuthenticationException("API key is required. Provide X-API-Key header.")
-    
-    if api_key != DEFAULT_API_KEY:
+
+    if not _is_valid_api_key(api_key):
         raise AuthenticationException("Invalid API key")
-    
+
     return True
+
+
+class APIKeyMiddleware:
+    """
+    ASGI middleware that rejects requests without a valid API key.
+
+    Runs before routing, so unauthenticated requests are answered with 401
+    before any request body is read or validated.
+    """
+
+    def __init__(
+        self,
+        app,
+        public_paths: Iterable[str] = (),
+        public_prefixes: Iterable[str] = ()
+    ):
+        """
+        Args:
+            app: ASGI application to wrap
+            public_paths: Exact paths served without an API key
+            public_prefixes: Path prefixes served without an API key
+        """
+        self.app = app
+        self.public_paths = frozenset(public_paths)
+        self.public_prefixes = tuple(public_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        # CORS preflight requests never carry the API key
+        if scope["type"] == "http" and scope["method"] != "OPTIONS":
+            path = scope["path"]
+            if path not in self.public_paths and not path.startswith(self.public_prefixes):
+                try:
+                    verify_api_key(Headers(scope=scope).get("x-api-key"))
+                except AuthenticationException as e:
+                    response = JSONResponse({"detail": e.message}, status_code=401)
+                    await response(scope, receive, send)
+                    return
+
+        await self.app(scope, receive, send)
@@ -1,13 +1,5 @@
 """Payment gateway converters for universal schema transformation."""
 
-from .base import (
-    BaseConverter,
-    StripeConverter,
-    SquareConverter,
-    PayPalConverter,
-    get_converter
-)
-
 __all__ = [
     'BaseConverter',
     'StripeConverter', 
@@ -15,3 +7,13 @@ __all__ = [
     'PayPalConverter',
     'get_converter'
 ]
+
+
+def __getattr__(name):
+    # Import the converters on first access rather than at package import
+    if name in __all__:
+        from . import base
+        value = getattr(base, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -319,19 +319,29 @@ class SquareConverter(BaseConverter):
             )
 
 
+# Gateway -> converter class
+_CONVERTER_CLASSES = {
+    PaymentGateway.STRIPE: StripeConverter,
+    PaymentGateway.PAYPAL: PayPalConverter,
+    PaymentGateway.SQUARE: SquareConverter
+}
+
+# Converters hold no per-request state, so one instance per gateway is shared
+_converters: Dict[PaymentGateway, BaseConverter] = {}
+
+
 def get_converter(gateway: PaymentGateway) -> BaseConverter:
-    """Factory function to get appropriate converter for gateway."""
-    converters = {
-        PaymentGateway.STRIPE: StripeConverter,
-        PaymentGateway.PAYPAL: PayPalConverter,
-        PaymentGateway.SQUARE: SquareConverter
-    }
+    """Factory function to get the shared converter for a gateway."""
+    converter = _converters.get(gateway)
+    if converter is not None:
+        return converter
     
-    converter_class = converters.get(gateway)
+    converter_class = _CONVERTER_CLASSES.get(gateway)
     if not converter_class:
         raise ConversionException(
             f"Unsupported gateway: {gateway.value}",
             gateway.value
         )
     
-    return converter_class()
+    converter = _converters[gateway] = converter_class()
+    return converter
@@ -1,26 +1,83 @@
 """Gateway fee calculator and optimizer for cost-based routing."""
 
+import functools
 import logging
-from decimal import Decimal
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
-from enum import Enum
+import os
+import re
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
+from enum import IntEnum
 
 from sdk.server.schemas.schemas import PaymentGateway, Currency
 
 logger = logging.getLogger(__name__)
 
+# Per-gateway fee logging runs on every fee calculation; it is off unless
+# MESHALTO_HOT_LOG=1, and selection logs a single summary line instead
+_HOT_LOG = os.getenv("MESHALTO_HOT_LOG", "0") == "1"
 
-class CardBrand(str, Enum):
-    """Card brand types."""
-    VISA = "visa"
-    MASTERCARD = "mastercard"
-    AMEX = "amex"
-    DISCOVER = "discover"
-    UNKNOWN = "unknown"
+# Percentages are also kept as integers scaled by 10^7 (2.9% -> 290000) so
+# fees can be computed on integer cents without Decimal arithmetic
+_RATE_SCALE = 10_000_000
 
 
-@dataclass
+def _divide_half_even(numerator: int, denominator: int) -> int:
+    """Integer division rounded half-to-even (matches Decimal.quantize)."""
+    quotient, remainder = divmod(numerator, denominator)
+    doubled = remainder * 2
+    if doubled > denominator or (doubled == denominator and quotient % 2):
+        quotient += 1
+    return quotient
+
+
+def to_cents(amount: Decimal) -> int:
+    """
+    Convert an amount to integer cents, rounding sub-cent amounts half-up.
+    
+    Same rounding as models.amount_to_cents, so a fee is quoted on the
+    amount that is stored for the transaction.
+    """
+    return int(Decimal(amount).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def _to_rate_units(rate: Decimal) -> int:
+    """Convert a percentage (0.029 for 2.9%) to units of 10^-7, rounding half-up."""
+    return int(Decimal(rate).scaleb(7).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> Decimal:
+    """Convert integer cents back to a two-place Decimal amount."""
+    return Decimal(cents).scaleb(-2)
+
+
+class CardBrand(IntEnum):
+    """
+    Card brand types.
+    
+    Integer-valued so brand checks in the fee paths are plain int compares;
+    the lowercase string form ("visa", "amex", ...) is available as
+    wire_name and is also accepted by the constructor.
+    """
+    UNKNOWN = 0
+    VISA = 1
+    MASTERCARD = 2
+    AMEX = 3
+    DISCOVER = 4
+    
+    @property
+    def wire_name(self) -> str:
+        """String form used in API payloads."""
+        return self.name.lower()
+    
+    @classmethod
+    def _missing_(cls, value):
+        if isinstance(value, str):
+            return cls.__members__.get(value.upper())
+        return None
+
+
+@dataclass(slots=True)
 class GatewayFeeStructure:
     """Fee structure for a payment gateway."""
     gateway: PaymentGateway
@@ -29,6 +86,16 @@ class GatewayFeeStructure:
     amex_surcharge: Decimal = Decimal("0.0")  # Additional % for Amex
     international_fee: Decimal = Decimal("0.0")  # Additional % for non-US cards
     currency: Currency = Currency.USD
+    _percentage_units: int = field(init=False, repr=False, compare=False)
+    _fixed_cents: int = field(init=False, repr=False, compare=False)
+    _amex_units: int = field(init=False, repr=False, compare=False)
+    _international_units: int = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self._percentage_units = _to_rate_units(self.percentage_fee)
+        self._fixed_cents = to_cents(self.fixed_fee)
+        self._amex_units = _to_rate_units(self.amex_surcharge)
+        self._international_units = _to_rate_units(self.international_fee)
     
     def calculate_fee(
         self,
@@ -37,21 +104,104 @@ class GatewayFeeStructure:
         is_international: bool = False
     ) -> Decimal:
         """Calculate total fee for a transaction."""
+        return from_cents(
+            self.calculate_fee_cents(to_cents(amount), card_brand, is_international)
+        )
+    
+    def calculate_fee_cents(
+        self,
+        amount_cents: int,
+        card_brand: Optional[CardBrand] = None,
+        is_international: bool = False
+    ) -> int:
+        """Calculate total fee in cents for an amount given in cents."""
+        rate_units = self.effective_rate_units(card_brand, is_international)
+        
+        # Calculate total fee: (amount * percentage) + fixed_fee
+        return _divide_half_even(
+            amount_cents * rate_units + self._fixed_cents * _RATE_SCALE,
+            _RATE_SCALE
+        )
+    
+    def effective_percentage(
+        self,
+        card_brand: Optional[CardBrand] = None,
+        is_international: bool = False
+    ) -> Decimal:
+        """Get the percentage fee including any brand/international surcharges."""
+        return Decimal(self.effective_rate_units(card_brand, is_international)) / _RATE_SCALE
+    
+    def effective_rate_units(
+        self,
+        card_brand: Optional[CardBrand] = None,
+        is_international: bool = False
+    ) -> int:
+        """Get the effective percentage fee scaled by 10^7."""
         # Base percentage fee
-        percentage = self.percentage_fee
+        rate_units = self._percentage_units
         
         # Add Amex surcharge if applicable
         if card_brand == CardBrand.AMEX:
-            percentage += self.amex_surcharge
+            rate_units += self._amex_units
         
         # Add international fee if applicable
         if is_international:
-            percentage += self.international_fee
+            rate_units += self._international_units
         
-        # Calculate total fee: (amount * percentage) + fixed_fee
-        fee = (amount * percentage) + self.fixed_fee
-        
-        return fee.quantize(Decimal("0.01"))
+        return rate_units
+
+
+@dataclass(frozen=True, slots=True)
+class FeeTables:
+    """
+    Column layout of the integer fee parameters for a set of gateways.
+    
+    Entry i of every column belongs to gateways[i], so a fee loop reads one
+    flat tuple per parameter instead of chasing a fee structure per gateway.
+    """
+    gateways: Tuple[PaymentGateway, ...]
+    percentage_units: Tuple[int, ...]
+    fixed_units: Tuple[int, ...]  # Fixed fee in cents scaled by 10^7
+    amex_units: Tuple[int, ...]
+    international_units: Tuple[int, ...]
+    
+    @classmethod
+    def from_fee_structures(
+        cls,
+        fee_structures: Sequence[GatewayFeeStructure]
+    ) -> "FeeTables":
+        """Build the columns from a sequence of fee structures."""
+        return cls(
+            gateways=tuple(f.gateway for f in fee_structures),
+            percentage_units=tuple(f._percentage_units for f in fee_structures),
+            fixed_units=tuple(f._fixed_cents * _RATE_SCALE for f in fee_structures),
+            amex_units=tuple(f._amex_units for f in fee_structures),
+            international_units=tuple(f._international_units for f in fee_structures),
+        )
+    
+    def rate_units(
+        self,
+        card_brand: Optional[CardBrand] = None,
+        is_international: bool = False
+    ) -> Tuple[int, ...]:
+        """Get the effective percentage fee (scaled by 10^7) per gateway."""
+        rates = self.percentage_units
+        if card_brand == CardBrand.AMEX:
+            rates = tuple(r + a for r, a in zip(rates, self.amex_units))
+        if is_international:
+            rates = tuple(r + i for r, i in zip(rates, self.international_units))
+        return rates
+    
+    def fees_cents(
+        self,
+        amount_cents: int,
+        rate_units: Sequence[int]
+    ) -> Tuple[int, ...]:
+        """Calculate the fee in cents per gateway for precomputed rates."""
+        return tuple(
+            _divide_half_even(amount_cents * rate + fixed, _RATE_SCALE)
+            for rate, fixed in zip(rate_units, self.fixed_units)
+        )
 
 
 class GatewayFeeCalculator:
@@ -88,6 +238,53 @@ class GatewayFeeCalculator:
         ),
     }
     
+    # Column layout of FEE_STRUCTURES; rebuilt lazily after
+    # update_fee_structure() resets it
+    _fee_tables: Optional[FeeTables] = None
+    
+    @classmethod
+    def _get_fee_tables(
+        cls,
+        available_gateways: Optional[Sequence[PaymentGateway]] = None
+    ) -> FeeTables:
+        """Get the fee tables for the available gateways."""
+        if available_gateways is None:
+            if cls._fee_tables is None:
+                cls._fee_tables = FeeTables.from_fee_structures(
+                    tuple(cls.FEE_STRUCTURES.values())
+                )
+            return cls._fee_tables
+        
+        fee_structures = []
+        for gateway in available_gateways:
+            fee_structure = cls.FEE_STRUCTURES.get(gateway)
+            if fee_structure is not None:
+                fee_structures.append(fee_structure)
+        
+        return FeeTables.from_fee_structures(fee_structures)
+    
+    @classmethod
+    @functools.lru_cache(maxsize=4096)
+    def _calculate_fees_cached(
+        cls,
+        amount_cents: int,
+        card_brand: Optional[CardBrand],
+        is_international: bool,
+        available_gateways: Optional[Tuple[PaymentGateway, ...]]
+    ) -> Tuple[Tuple[PaymentGateway, int], ...]:
+        """
+        Calculate fees in cents per gateway.
+        
+        Fees are a pure function of these arguments while the fee structures
+        are unchanged, so results are memoized; update_fee_structure() clears
+        the cache.
+        """
+        tables = cls._get_fee_tables(available_gateways)
+        return tuple(zip(
+            tables.gateways,
+            tables.fees_cents(amount_cents, tables.rate_units(card_brand, is_international))
+        ))
+    
     @classmethod
     def calculate_fees_for_all_gateways(
         cls,
@@ -108,27 +305,98 @@ class GatewayFeeCalculator:
         Returns:
             Dictionary mapping gateway to calculated fee
         """
-        if available_gateways is None:
-            available_gateways = list(cls.FEE_STRUCTURES.keys())
+        if available_gateways is not None:
+            available_gateways = tuple(available_gateways)
+        
+        log_fees = _HOT_LOG and logger.isEnabledFor(logging.INFO)
         
         fees = {}
-        for gateway in available_gateways:
-            if gateway in cls.FEE_STRUCTURES:
-                fee_structure = cls.FEE_STRUCTURES[gateway]
-                fee = fee_structure.calculate_fee(
-                    amount=amount,
-                    card_brand=card_brand,
-                    is_international=is_international
-                )
-                fees[gateway] = fee
-                
+        for gateway, fee_cents in cls._calculate_fees_cached(
+            to_cents(amount), card_brand, is_international, available_gateways
+        ):
+            fee = from_cents(fee_cents)
+            fees[gateway] = fee
+            
+            if log_fees:
                 logger.info(
-                    f"{gateway.value}: Fee ${fee:.2f} for ${amount:.2f} "
-                    f"(brand: {card_brand}, international: {is_international})"
+                    "%s: Fee $%.2f for $%.2f (brand: %s, international: %s)",
+                    gateway.value, fee, amount,
+                    card_brand.wire_name if card_brand else None, is_international
                 )
         
         return fees
     
+    @classmethod
+    def calculate_fee(
+        cls,
+        gateway: PaymentGateway,
+        amount: Decimal,
+        card_brand: Optional[CardBrand] = None,
+        is_international: bool = False
+    ) -> Decimal:
+        """
+        Calculate the fee for a single gateway.
+        
+        Uses the same memoized fee cache as the multi-gateway calculations,
+        so a repeated amount and card profile costs one cache lookup.
+        
+        Args:
+            gateway: Payment gateway
+            amount: Transaction amount
+            card_brand: Card brand (VISA, MASTERCARD, AMEX, etc.)
+            is_international: Whether card is international
+            
+        Returns:
+            Calculated fee
+            
+        Raises:
+            ValueError: If the gateway has no fee structure
+        """
+        fees_cents = cls._calculate_fees_cached(
+            to_cents(amount), card_brand, is_international, (gateway,)
+        )
+        if not fees_cents:
+            raise ValueError(f"No fee structure for gateway: {gateway.value}")
+        
+        return from_cents(fees_cents[0][1])
+    
+    @classmethod
+    def calculate_fees_batch(
+        cls,
+        amounts: Sequence[Decimal],
+        card_brand: Optional[CardBrand] = None,
+        is_international: bool = False,
+        available_gateways: Optional[List[PaymentGateway]] = None
+    ) -> List[Dict[PaymentGateway, Decimal]]:
+        """
+        Calculate fees for many amounts sharing the same card profile.
+        
+        Fee structures and effective percentages are resolved once for the
+        whole batch, so each amount only costs one integer multiply-add per
+        gateway.
+        
+        Args:
+            amounts: Transaction amounts
+            card_brand: Card brand (VISA, MASTERCARD, AMEX, etc.)
+            is_international: Whether card is international
+            available_gateways: List of available gateways (None = all)
+            
+        Returns:
+            List of gateway-to-fee dictionaries, one per amount
+        """
+        tables = cls._get_fee_tables(available_gateways)
+        rate_units = tables.rate_units(card_brand, is_international)
+        
+        batch = []
+        for amount in amounts:
+            fees_cents = tables.fees_cents(to_cents(amount), rate_units)
+            batch.append({
+                gateway: from_cents(fee_cents)
+                for gateway, fee_cents in zip(tables.gateways, fees_cents)
+            })
+        
+        return batch
+    
     @classmethod
     def select_cheapest_gateway(
         cls,
@@ -161,19 +429,19 @@ class GatewayFeeCalculator:
         if not fees:
             raise ValueError("No available gateways for fee calculation")
         
-        # Apply preference weights if provided
-        adjusted_fees = fees.copy()
-        if preference_weight:
-            for gateway, weight in preference_weight.items():
-                if gateway in adjusted_fees:
-                    adjusted_fees[gateway] += weight
-        
-        # Find gateway with minimum fee
-        cheapest_gateway = min(adjusted_fees, key=adjusted_fees.get)
+        # Find gateway with minimum fee (preference weights applied on the fly)
+        cheapest_gateway = None
+        cheapest_adjusted = None
+        for gateway, fee in fees.items():
+            adjusted = fee + preference_weight.get(gateway, 0) if preference_weight else fee
+            if cheapest_adjusted is None or adjusted < cheapest_adjusted:
+                cheapest_gateway = gateway
+                cheapest_adjusted = adjusted
         cheapest_fee = fees[cheapest_gateway]  # Use original fee, not adjusted
         
         logger.info(
-            f"Selected gateway: {cheapest_gateway.value} with fee ${cheapest_fee:.2f}"
+            "Selected gateway: %s with fee $%.2f for $%.2f (%d gateways compared)",
+            cheapest_gateway.value, cheapest_fee, amount, len(fees)
         )
         
         return cheapest_gateway, cheapest_fee, fees
@@ -191,48 +459,47 @@ class GatewayFeeCalculator:
         Returns:
             Dictionary with comparison details and recommendations
         """
-        fees = cls.calculate_fees_for_all_gateways(
-            amount=amount,
-            card_brand=card_brand,
-            is_international=is_international
+        amount_cents = to_cents(amount)
+        fees_cents = cls._calculate_fees_cached(
+            amount_cents, card_brand, is_international, None
         )
-        
-        if not fees:
+        if not fees_cents:
             return {"error": "No gateways available"}
         
-        # Calculate effective rate for each gateway
-        effective_rates = {}
-        for gateway, fee in fees.items():
-            effective_rate = (fee / amount * 100) if amount > 0 else Decimal("0")
-            effective_rates[gateway] = effective_rate
-        
-        # Find cheapest and most expensive
-        cheapest = min(fees, key=fees.get)
-        most_expensive = max(fees, key=fees.get)
+        # Single pass over integer cents: the float fee, effective rate and
+        # net amount come from one int division each (no Decimal arithmetic)
+        # while tracking the cheapest and most expensive gateway
+        comparison = {}
+        cheapest = most_expensive = None
+        cheapest_cents = max_cents = 0
+        for gateway, fee_cents in fees_cents:
+            comparison[gateway.value] = {
+                "fee": fee_cents / 100,
+                "effective_rate": fee_cents * 100 / amount_cents if amount_cents > 0 else 0.0,
+                "net_amount": (amount_cents - fee_cents) / 100
+            }
+            
+            if cheapest is None or fee_cents < cheapest_cents:
+                cheapest, cheapest_cents = gateway, fee_cents
+            if most_expensive is None or fee_cents > max_cents:
+                most_expensive, max_cents = gateway, fee_cents
         
-        savings = fees[most_expensive] - fees[cheapest]
-        savings_percentage = (savings / fees[most_expensive] * 100) if fees[most_expensive] > 0 else Decimal("0")
+        savings_cents = max_cents - cheapest_cents
+        cheapest_comparison = comparison[cheapest.value]
         
         return {
             "amount": float(amount),
-            "card_brand": card_brand.value if card_brand else "unknown",
+            "card_brand": card_brand.wire_name if card_brand else "unknown",
             "is_international": is_international,
-            "fees": {
-                gateway.value: {
-                    "fee": float(fee),
-                    "effective_rate": float(effective_rates[gateway]),
-                    "net_amount": float(amount - fee)
-                }
-                for gateway, fee in fees.items()
-            },
+            "fees": comparison,
             "recommendation": {
                 "gateway": cheapest.value,
-                "fee": float(fees[cheapest]),
-                "effective_rate": float(effective_rates[cheapest])
+                "fee": cheapest_comparison["fee"],
+                "effective_rate": cheapest_comparison["effective_rate"]
             },
             "savings": {
-                "amount": float(savings),
-                "percentage": float(savings_percentage),
+                "amount": savings_cents / 100,
+                "percentage": savings_cents * 100 / max_cents if max_cents > 0 else 0.0,
                 "vs_gateway": most_expensive.value
             }
         }
@@ -257,7 +524,7 @@ class GatewayFeeCalculator:
             international_fee: New international fee
         """
         if gateway not in cls.FEE_STRUCTURES:
-            logger.warning(f"Gateway {gateway.value} not found in fee structures")
+            logger.warning("Gateway %s not found in fee structures", gateway.value)
             return
         
         current = cls.FEE_STRUCTURES[gateway]
@@ -270,42 +537,114 @@ class GatewayFeeCalculator:
             international_fee=international_fee if international_fee is not None else current.international_fee,
             currency=current.currency
         )
+        cls._fee_tables = None
+        cls._calculate_fees_cached.cache_clear()
         
-        logger.info(f"Updated fee structure for {gateway.value}")
+        logger.info("Updated fee structure for %s", gateway.value)
+
+
+# Brand keywords matched in a single scan. Hints accept looser names
+# ("Mastercard", "American Express"); tokens use the short forms gateways
+# embed in test tokens ("tok_mastercard", "tok_mc", ...)
+_BRAND_HINT_PATTERN = re.compile(r"visa|master|amex|american|discover", re.IGNORECASE)
+_BRAND_TOKEN_PATTERN = re.compile(r"visa|mastercard|mc|amex|discover", re.IGNORECASE)
+
+_BRAND_KEYWORDS = {
+    "visa": CardBrand.VISA,
+    "master": CardBrand.MASTERCARD,
+    "mastercard": CardBrand.MASTERCARD,
+    "mc": CardBrand.MASTERCARD,
+    "amex": CardBrand.AMEX,
+    "american": CardBrand.AMEX,
+    "discover": CardBrand.DISCOVER,
+}
+
+# Card brands by wire name ("visa", "amex", ...), for parsing API input
+_BRAND_BY_WIRE_NAME = {brand.wire_name: brand for brand in CardBrand}
+
+# Issuer identification number ranges (first six digits of the card number)
+_BIN_RANGES = (
+    (400000, 499999, CardBrand.VISA),
+    (510000, 559999, CardBrand.MASTERCARD),
+    (222100, 272099, CardBrand.MASTERCARD),
+    (340000, 349999, CardBrand.AMEX),
+    (370000, 379999, CardBrand.AMEX),
+    (601100, 601199, CardBrand.DISCOVER),
+    (644000, 659999, CardBrand.DISCOVER),
+)
+
+
+def card_brand_from_name(
+    name: str,
+    default: CardBrand = CardBrand.UNKNOWN
+) -> CardBrand:
+    """
+    Parse a card brand from its wire name, case-insensitively.
+    
+    Unlike CardBrand(name), an unknown name returns the default instead of
+    raising ValueError.
+    
+    Args:
+        name: Brand name ("visa", "Mastercard", ...)
+        default: Brand to return for unknown names
+        
+    Returns:
+        CardBrand enum
+    """
+    return _BRAND_BY_WIRE_NAME.get(name.lower(), default)
+
+
+def detect_card_brand_from_bin(card_bin: str) -> CardBrand:
+    """
+    Detect card brand from the card's BIN (leading digits of the card number).
+    
+    Args:
+        card_bin: Leading digits of the card number (up to six are used)
+        
+    Returns:
+        CardBrand enum
+    """
+    if not card_bin or not card_bin.isdigit():
+        return CardBrand.UNKNOWN
+    
+    prefix = int(card_bin[:6].ljust(6, "0"))
+    for low, high, brand in _BIN_RANGES:
+        if low <= prefix <= high:
+            return brand
+    
+    return CardBrand.UNKNOWN
 
 
 # Helper function to detect card brand from token
-def detect_card_brand(token: str, brand_hint: Optional[str] = None) -> CardBrand:
+def detect_card_brand(
+    token: str,
+    brand_hint: Optional[str] = None,
+    card_bin: Optional[str] = None
+) -> CardBrand:
     """
-    Detect card brand from token or brand hint.
+    Detect card brand from BIN, brand hint or token.
     
     Args:
         token: Payment token
         brand_hint: Optional brand from payment_token.brand
+        card_bin: Optional card BIN, preferred over hint/token when known
         
     Returns:
         CardBrand enum
     """
+    if card_bin:
+        brand = detect_card_brand_from_bin(card_bin)
+        if brand != CardBrand.UNKNOWN:
+            return brand
+    
     if brand_hint:
-        brand_lower = brand_hint.lower()
-        if "visa" in brand_lower:
-            return CardBrand.VISA
-        elif "master" in brand_lower:
-            return CardBrand.MASTERCARD
-        elif "amex" in brand_lower or "american" in brand_lower:
-            return CardBrand.AMEX
-        elif "discover" in brand_lower:
-            return CardBrand.DISCOVER
+        match = _BRAND_HINT_PATTERN.search(brand_hint)
+        if match:
+            return _BRAND_KEYWORDS[match.group(0).lower()]
     
     # Try to detect from token
-    token_lower = token.lower()
-    if "visa" in token_lower:
-        return CardBrand.VISA
-    elif "mastercard" in token_lower or "mc" in token_lower:
-        return CardBrand.MASTERCARD
-    elif "amex" in token_lower:
-        return CardBrand.AMEX
-    elif "discover" in token_lower:
-        return CardBrand.DISCOVER
+    match = _BRAND_TOKEN_PATTERN.search(token)
+    if match:
+        return _BRAND_KEYWORDS[match.group(0).lower()]
     
     return CardBrand.UNKNOWN
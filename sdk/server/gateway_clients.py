@@ -23,9 +23,22 @@ generated on the client side, not raw card data.
 """
 
 import os
+import asyncio
+import base64
+import functools
+import hashlib
+import hmac
 import logging
+import operator
+import re
+import threading
+import time
+import uuid
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, Any, ClassVar, List, Mapping, Optional, Sequence, Tuple, Union
 import httpx
 
 from sdk.server.schemas.schemas import (
@@ -38,14 +51,462 @@ from sdk.server.schemas.exceptions import GatewayException
 
 logger = logging.getLogger(__name__)
 
+# Optional gateway SDKs, imported once; clients fall back to mock mode
+# when they are not installed
+try:
+    import stripe
+except ImportError:
+    logger.warning("Stripe SDK not installed. Using mock mode.")
+    stripe = None
+
+# Converts a Stripe object to a plain dict, resolved once for the installed
+# SDK version instead of probed per charge
+if stripe is not None and hasattr(stripe.StripeObject, "to_dict"):
+    _stripe_object_to_dict = operator.methodcaller("to_dict")
+else:
+    _stripe_object_to_dict = dict
+
+try:
+    from square.client import Client as SquareSDKClient
+except ImportError:
+    logger.warning("Square SDK not installed. Using mock mode.")
+    SquareSDKClient = None
+
+# Gateway status -> normalized payment status
+_STRIPE_STATUS: Mapping[str, PaymentStatus] = MappingProxyType({
+    "succeeded": PaymentStatus.COMPLETED,
+    "pending": PaymentStatus.PENDING,
+    "failed": PaymentStatus.FAILED
+})
+
+_PAYPAL_STATUS: Mapping[str, PaymentStatus] = MappingProxyType({
+    "COMPLETED": PaymentStatus.COMPLETED,
+    "PENDING": PaymentStatus.PENDING,
+    "FAILED": PaymentStatus.FAILED
+})
+
+_SQUARE_STATUS: Mapping[str, PaymentStatus] = MappingProxyType({
+    "COMPLETED": PaymentStatus.COMPLETED,
+    "APPROVED": PaymentStatus.AUTHORIZED,  # Authorized but not captured
+    "PENDING": PaymentStatus.PENDING,
+    "FAILED": PaymentStatus.FAILED,
+    "CANCELED": PaymentStatus.CANCELLED,
+    "CANCELLED": PaymentStatus.CANCELLED
+})
+
+
+# Optional Square CreatePayment fields passed through from the payload
+_SQUARE_OPTIONAL_FIELDS = frozenset({
+    'customer_id', 'reference_id', 'note', 'billing_address',
+    'shipping_address', 'verification_token', 'tip_money',
+    'app_fee_money', 'autocomplete', 'statement_description_identifier'
+})
+
+# Payload fields echoed into a mock Square payment when set
+_SQUARE_MOCK_COPY_FIELDS = ('customer_id', 'reference_id', 'note', 'tip_money', 'app_fee_money')
+
+# Static parts of a mock Square payment; per-call fields (None here) are
+# filled in by merging over these templates, which keeps the key order
+_SQUARE_MOCK_CARD = MappingProxyType({
+    "card_brand": None,
+    "last_4": "4242",
+    "exp_month": 12,
+    "exp_year": 2025,
+    "fingerprint": "sq-1-mock-fingerprint",
+    "card_type": "CREDIT",
+    "prepaid_type": "NOT_PREPAID",
+    "bin": "424242"
+})
+
+_SQUARE_MOCK_CARD_DETAILS = MappingProxyType({
+    "status": "CAPTURED",
+    "card": None,
+    "entry_method": "KEYED",
+    "cvv_status": "CVV_ACCEPTED",
+    "avs_status": "AVS_ACCEPTED",
+    "statement_description": None
+})
+
+_SQUARE_MOCK_PAYMENT = MappingProxyType({
+    "id": "PAYMENT-MOCK-12345",
+    "status": None,
+    "source_type": "CARD",
+    "card_details": None,
+    "amount_money": None,
+    "total_money": None,
+    "approved_money": None,
+    "receipt_number": "MOCK-RECEIPT-123",
+    "receipt_url": "https://squareup.com/receipt/mock",
+    "created_at": None,
+    "updated_at": None,
+    "location_id": None
+})
+
+# Demo card brand from a mock Square source_id (VISA when no group matches)
+_SQUARE_MOCK_BRAND_PATTERN = re.compile(r"(mastercard)|(amex)|(discover)", re.IGNORECASE)
+_SQUARE_MOCK_BRANDS = ("MASTERCARD", "AMERICAN_EXPRESS", "DISCOVER")
+
+
+# Webhook signing keys by (gateway, key_id) with the monotonic time they
+# were loaded, so verification does not fetch a key per webhook
+SIGNING_KEY_TTL_SECONDS = 4 * 3600
+
+# Maximum age of a signed Stripe webhook (Stripe's own default tolerance)
+STRIPE_WEBHOOK_TOLERANCE_SECONDS = 300
+_signing_key_cache: Dict[Tuple[PaymentGateway, str], Tuple[float, Optional[bytes]]] = {}
+
+
+# Above this SHA-256 cost (~6 cycles/byte at 3 GHz) the interpreter's
+# OpenSSL is most likely not using the CPU's SHA extensions
+SHA256_SLOW_NS_PER_BYTE = 2.0
+_SHA256_PROBE_SIZE = 1 << 20
+
+
+def check_sha256_throughput() -> float:
+    """
+    Time SHA-256 over 1 MiB and warn if it looks unaccelerated.
+    
+    Call once at startup; webhook verification is bound by SHA-256, so a
+    slow build is worth knowing about before traffic arrives.
+    
+    Returns:
+        Measured cost in nanoseconds per byte
+    """
+    buffer = bytes(_SHA256_PROBE_SIZE)
+    start = time.perf_counter_ns()
+    hashlib.sha256(buffer).digest()
+    ns_per_byte = (time.perf_counter_ns() - start) / _SHA256_PROBE_SIZE
+    
+    if ns_per_byte > SHA256_SLOW_NS_PER_BYTE:
+        logger.warning(
+            "SHA-256 runs at %.2f ns/byte; SHA extensions do not appear to be "
+            "active, so webhook verification will be CPU-bound",
+            ns_per_byte
+        )
+    return ns_per_byte
+
+
+# Raw webhook body types, hashed as-is with no copy or re-encode
+_RAW_BODY_TYPES = (bytes, bytearray, memoryview)
+
+# Lengths of a hex and a base64 SHA-256 digest
+_SHA256_HEX_LENGTH = 64
+_SHA256_BASE64_LENGTH = 44
+
+
+@functools.lru_cache(maxsize=16)
+def _hmac_sha256_prototype(signing_key: bytes) -> "hmac.HMAC":
+    """
+    Get an HMAC-SHA256 object that has already absorbed the signing key.
+    
+    Callers copy() it per message, which skips hashing the key pads on
+    every webhook. A rotated key gets its own entry.
+    """
+    return hmac.new(signing_key, digestmod=hashlib.sha256)
+
+
+def _hmac_sha256(signing_key: bytes, *parts: bytes) -> bytes:
+    """Compute HMAC-SHA256 of the concatenated parts from the cached key state."""
+    mac = _hmac_sha256_prototype(signing_key).copy()
+    for part in parts:
+        mac.update(part)
+    return mac.digest()
+
+
+# Worker threads for the blocking gateway SDK calls, so a network round trip
+# does not stall the event loop
+GATEWAY_EXECUTOR_WORKERS = int(os.getenv("GATEWAY_EXECUTOR_WORKERS", "32"))
+_gateway_executor: Optional[ThreadPoolExecutor] = None
+
+
+async def _run_blocking(func, *args, **kwargs):
+    """Run a blocking SDK call on the gateway thread pool."""
+    global _gateway_executor
+    if _gateway_executor is None:
+        _gateway_executor = ThreadPoolExecutor(
+            max_workers=GATEWAY_EXECUTOR_WORKERS,
+            thread_name_prefix="gw-"
+        )
+    return await asyncio.get_running_loop().run_in_executor(
+        _gateway_executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+def shutdown_gateway_executor():
+    """Shut down the gateway thread pool (call on application shutdown)."""
+    global _gateway_executor
+    if _gateway_executor is not None:
+        _gateway_executor.shutdown(wait=True)
+        _gateway_executor = None
+
+
+@functools.cache
+def _env(name: str, default: Optional[str] = None) -> Optional[str]:
+    """
+    Read gateway configuration from the environment, once per variable.
+    
+    Call reload_gateway_config() after changing the environment at runtime.
+    """
+    return os.getenv(name, default)
+
+
+def reload_gateway_config():
+    """Forget cached gateway configuration so it is re-read from the environment."""
+    _env.cache_clear()
+
+
+# A forked worker re-reads its configuration rather than inheriting the cache
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reload_gateway_config)
+
+
+# Responses of recent payments by idempotency key, so a replayed request
+# (client retry, retry policy) returns the first result instead of charging
+# again. A payment still in flight is recorded as a future under its key, so
+# a concurrent request with the same key (a retry while the first call is
+# pending, duplicate keys in one batch) waits for that payment instead of
+# making its own. The maps are split into shards with one threading.Lock
+# each: the critical sections never await, so a plain lock is correct and
+# concurrent payments rarely contend. The store is per process; across
+# workers, PaymentProcessor dedups on the transaction's idempotency key.
+_IDEMPOTENCY_SHARDS = 64  # Power of two (shard = hash & (N - 1))
+_IDEMPOTENCY_SHARD_SIZE = 256
+_idempotency_locks = tuple(threading.Lock() for _ in range(_IDEMPOTENCY_SHARDS))
+_idempotency_responses: Tuple[Dict[tuple, Dict[str, Any]], ...] = tuple(
+    {} for _ in range(_IDEMPOTENCY_SHARDS)
+)
+# In-flight payments are kept apart from the bounded response maps so that
+# eviction can never drop one
+_idempotency_in_flight: Tuple[Dict[tuple, asyncio.Future], ...] = tuple(
+    {} for _ in range(_IDEMPOTENCY_SHARDS)
+)
+
+# Where each converter puts the request's idempotency key
+_IDEMPOTENCY_HEADERS = ("Idempotency-Key", "PayPal-Request-Id")
+
+
+def _request_idempotency_key(request: GatewayNativeRequest) -> Optional[str]:
+    """Get the idempotency key of a gateway-native request, if any."""
+    key = request.payload.get("idempotency_key")
+    if key is None and request.headers:
+        for header in _IDEMPOTENCY_HEADERS:
+            key = request.headers.get(header)
+            if key is not None:
+                break
+    return key
+
+
+def _hash_api_key(api_key: Optional[str]) -> Optional[bytes]:
+    """Hash an API key for use in a cache key."""
+    if api_key is None:
+        return None
+    return hashlib.blake2b(api_key.encode("utf-8"), digest_size=16).digest()
+
+
+def _idempotent(process_payment):
+    """
+    Make each idempotency key charge at most once.
+    
+    A replayed key returns a copy of the stored response. A key that is
+    still in flight waits for that payment; if it fails, the waiting
+    request makes the payment itself.
+    """
+    @functools.wraps(process_payment)
+    async def wrapper(self, request: GatewayNativeRequest) -> Dict[str, Any]:
+        key = _request_idempotency_key(request)
+        if key is None:
+            return await process_payment(self, request)
+        
+        while True:
+            entry = self._claim_idempotency(key)
+            if entry is None:
+                break
+            if not isinstance(entry, asyncio.Future):
+                logger.info("Returning stored response for idempotency key %s", key)
+                return dict(entry)
+            
+            # Shielded so a cancelled waiter does not cancel the payment
+            stored = await asyncio.shield(entry)
+            if stored is not None:
+                logger.info("Returning in-flight response for idempotency key %s", key)
+                return dict(stored)
+        
+        response = None
+        try:
+            response = await process_payment(self, request)
+        finally:
+            self._settle_idempotency(key, response)
+        return response
+    
+    return wrapper
+
+
+def _not_implemented(method):
+    """Mark an optional operation stub so callers can check support up front."""
+    method.__notimplemented__ = True
+    return method
+
+
+def _utc_timestamp() -> str:
+    """Current UTC time in the ISO 8601 'Z' form used by gateway responses."""
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def _square_signature_matches(
+    signing_key: bytes,
+    notification_url: bytes,
+    payload: Union[bytes, memoryview, dict],
+    signature: Optional[str]
+) -> bool:
+    """
+    Check a Square webhook signature.
+    
+    Square signs the subscription's notification URL followed by the raw
+    body with HMAC-SHA256, and sends the base64 digest in the
+    x-square-hmacsha256-signature header.
+    """
+    # A base64 SHA-256 digest always has this public, fixed length, so wrong
+    # lengths are rejected without computing the HMAC
+    if not signature or len(signature) != _SHA256_BASE64_LENGTH:
+        return False
+    if not isinstance(payload, _RAW_BODY_TYPES):
+        return False
+    
+    expected = base64.b64encode(_hmac_sha256(signing_key, notification_url, payload))
+    return hmac.compare_digest(expected, signature.encode("utf-8"))
+
 
 class BaseGatewayClient(ABC):
     """Base class for gateway clients."""
     
+    __slots__ = ("gateway", "base_url", "api_key", "_api_key_digest")
+    
+    # One pooled HTTP client per gateway, shared by all client instances so
+    # repeated calls reuse keep-alive connections (no new TCP/TLS handshake)
+    _http_clients: ClassVar[Dict[PaymentGateway, httpx.AsyncClient]] = {}
+    
     def __init__(self, gateway: PaymentGateway, custom_api_key: Optional[str] = None):
         self.gateway = gateway
         self.base_url = self._get_base_url()
         self.api_key = custom_api_key or self._get_api_key()
+        # Idempotency keys are scoped per account by a digest, never the key
+        self._api_key_digest = _hash_api_key(self.api_key)
+    
+    async def _get_http(self) -> httpx.AsyncClient:
+        """
+        Get the shared HTTP client for this gateway, creating it on first use.
+        
+        Credentials differ per client instance (custom API keys), so they must
+        be passed per request rather than set on the shared client.
+        """
+        client = self._http_clients.get(self.gateway)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(10.0, connect=3.0),
+                limits=httpx.Limits(
+                    max_keepalive_connections=20,
+                    max_connections=100,
+                    keepalive_expiry=30.0
+                )
+            )
+            self._http_clients[self.gateway] = client
+        return client
+    
+    def _claim_idempotency(self, key: str) -> Optional[Union[Dict[str, Any], asyncio.Future]]:
+        """
+        Look up an idempotency key, claiming it if it is unused.
+        
+        Args:
+            key: Idempotency key of the payment request
+            
+        Returns:
+            The stored response, the future of the payment in flight, or
+            None if the caller now owns the key and must settle it with
+            _settle_idempotency()
+        """
+        cache_key = (self.gateway, self._api_key_digest, key)
+        shard = hash(key) & (_IDEMPOTENCY_SHARDS - 1)
+        with _idempotency_locks[shard]:
+            entry = _idempotency_responses[shard].get(cache_key)
+            if entry is None:
+                entry = _idempotency_in_flight[shard].get(cache_key)
+            if entry is None:
+                _idempotency_in_flight[shard][cache_key] = (
+                    asyncio.get_running_loop().create_future()
+                )
+            return entry
+    
+    def _settle_idempotency(self, key: str, response: Optional[Dict[str, Any]]):
+        """
+        Finish a claimed idempotency key and wake any requests waiting on it.
+        
+        A response is stored (oldest entries evicted first); None, for a
+        failed payment, releases the key so a waiting request can retry.
+        """
+        cache_key = (self.gateway, self._api_key_digest, key)
+        shard = hash(key) & (_IDEMPOTENCY_SHARDS - 1)
+        # Stored separately from the caller's dict, which it may change
+        stored = dict(response) if response is not None else None
+        responses = _idempotency_responses[shard]
+        with _idempotency_locks[shard]:
+            future = _idempotency_in_flight[shard].pop(cache_key, None)
+            if stored is not None:
+                if len(responses) >= _IDEMPOTENCY_SHARD_SIZE:
+                    del responses[next(iter(responses))]
+                responses[cache_key] = stored
+        if future is not None and not future.done():
+            future.set_result(stored)
+    
+    def supports(self, operation: str) -> bool:
+        """
+        Check whether this gateway implements an optional operation.
+        
+        Args:
+            operation: Method name (refund_payment, void_payment, ...)
+            
+        Returns:
+            False if the gateway still uses the base-class stub
+        """
+        return not getattr(getattr(type(self), operation), "__notimplemented__", False)
+    
+    def _fetch_signing_key(self, key_id: str) -> Optional[bytes]:
+        """
+        Load a webhook signing key.
+        
+        The default reads <GATEWAY>_WEBHOOK_SECRET from the environment;
+        gateways that publish keys by id override this.
+        """
+        secret = os.getenv(f"{self.gateway.name}_WEBHOOK_SECRET")
+        return secret.encode("utf-8") if secret else None
+    
+    def _get_signing_key(self, key_id: str = "default") -> Optional[bytes]:
+        """
+        Get a webhook signing key, cached for SIGNING_KEY_TTL_SECONDS.
+        
+        Args:
+            key_id: Key identifier (for gateways that rotate keys)
+            
+        Returns:
+            Signing key bytes, or None if no key is configured
+        """
+        cache_key = (self.gateway, key_id)
+        now = time.monotonic()
+        entry = _signing_key_cache.get(cache_key)
+        if entry is not None and now - entry[0] < SIGNING_KEY_TTL_SECONDS:
+            return entry[1]
+        
+        signing_key = self._fetch_signing_key(key_id)
+        _signing_key_cache[cache_key] = (now, signing_key)
+        return signing_key
+    
+    @classmethod
+    async def close_http_clients(cls):
+        """Close all shared HTTP clients (call on application shutdown)."""
+        clients = list(cls._http_clients.values())
+        cls._http_clients.clear()
+        for client in clients:
+            await client.aclose()
     
     @abstractmethod
     def _get_base_url(self) -> str:
@@ -67,6 +528,7 @@ class BaseGatewayClient(ABC):
         """Normalize gateway response to standard format."""
         pass
     
+    @_not_implemented
     async def refund_payment(
         self,
         gateway_transaction_id: str,
@@ -88,6 +550,7 @@ class BaseGatewayClient(ABC):
         """
         raise NotImplementedError("Refund not implemented for this gateway")
     
+    @_not_implemented
     async def void_payment(self, gateway_transaction_id: str) -> Dict[str, Any]:
         """
         Void/cancel an authorized payment.
@@ -100,6 +563,7 @@ class BaseGatewayClient(ABC):
         """
         raise NotImplementedError("Void not implemented for this gateway")
     
+    @_not_implemented
     async def capture_payment(
         self,
         gateway_transaction_id: str,
@@ -117,6 +581,7 @@ class BaseGatewayClient(ABC):
         """
         raise NotImplementedError("Capture not implemented for this gateway")
     
+    @_not_implemented
     async def setup_recurring_payment(
         self,
         recurring_request: RecurringPaymentRequest
@@ -134,14 +599,14 @@ class BaseGatewayClient(ABC):
     
     async def verify_webhook(
         self,
-        payload: dict,
+        payload: Union[bytes, memoryview, dict],
         signature: Optional[str] = None
     ) -> bool:
         """
         Verify webhook signature.
         
         Args:
-            payload: Webhook payload
+            payload: Webhook payload (raw request body when available)
             signature: Webhook signature
             
         Returns:
@@ -154,49 +619,47 @@ class BaseGatewayClient(ABC):
 class StripeClient(BaseGatewayClient):
     """Stripe payment gateway client."""
     
+    __slots__ = ("stripe", "use_real_api")
+    
     def __init__(self, custom_api_key: Optional[str] = None):
         super().__init__(PaymentGateway.STRIPE, custom_api_key)
-        # Initialize Stripe SDK
-        try:
-            import stripe
-            stripe.api_key = self.api_key
-            self.stripe = stripe
-            self.use_real_api = True
-            logger.info(f"Stripe SDK initialized with key: {self.api_key[:20]}...")
-        except ImportError:
-            logger.warning("Stripe SDK not installed. Using mock mode.")
-            self.stripe = None
-            self.use_real_api = False
+        self.stripe = stripe
+        self.use_real_api = stripe is not None
     
     def _get_base_url(self) -> str:
-        return os.getenv("STRIPE_API_URL", "https://api.stripe.com")
+        return _env("STRIPE_API_URL", "https://api.stripe.com")
     
     def _get_api_key(self) -> str:
-        return os.getenv("STRIPE_API_KEY", "sk_test_demo_key")
+        return _env("STRIPE_API_KEY", "sk_test_demo_key")
     
+    @_idempotent
     async def process_payment(self, request: GatewayNativeRequest) -> Dict[str, Any]:
         """
         Process payment through Stripe using real SDK.
         Supports both legacy tokens (tok_*) and PaymentMethods (pm_*).
         """
+        payload = request.payload
+        stripe_sdk = self.stripe
         try:
-            if self.use_real_api and self.stripe:
+            if self.use_real_api:
                 # REAL STRIPE API CALL
-                source_or_pm = request.payload.get('source', 'N/A')
-                logger.info(f"Processing REAL Stripe payment with source/pm: {source_or_pm}")
+                source_or_pm = payload.get('source', 'N/A')
+                logger.info("Processing REAL Stripe payment with source/pm: %s", source_or_pm)
                 
                 # Check if we have a PaymentMethod (pm_*) or legacy token (tok_*)
                 if source_or_pm.startswith('pm_'):
                     # Use Payment Intents API for PaymentMethods
                     logger.info("Using Payment Intents API for PaymentMethod")
                     
-                    payment_intent = self.stripe.PaymentIntent.create(
-                        amount=request.payload['amount'],
-                        currency=request.payload['currency'],
+                    payment_intent = await _run_blocking(
+                        stripe_sdk.PaymentIntent.create,
+                        amount=payload['amount'],
+                        currency=payload['currency'],
                         payment_method=source_or_pm,
+                        api_key=self.api_key,
                         confirm=True,  # Immediately confirm the payment
-                        description=request.payload.get('description'),
-                        metadata=request.payload.get('metadata', {}),
+                        description=payload.get('description'),
+                        metadata=payload.get('metadata', {}),
                         automatic_payment_methods={
                             'enabled': True,
                             'allow_redirects': 'never'
@@ -214,41 +677,43 @@ class StripeClient(BaseGatewayClient):
                         'payment_method': payment_intent.payment_method,
                         'created': payment_intent.created
                     }
-                    logger.info(f"Stripe PaymentIntent created successfully: {response.get('id')}")
+                    logger.info("Stripe PaymentIntent created successfully: %s", response.get('id'))
                     return response
                     
                 else:
                     # Use legacy Charges API for tokens
                     logger.info("Using Charges API for token")
                     
-                    charge = self.stripe.Charge.create(
-                        amount=request.payload['amount'],
-                        currency=request.payload['currency'],
+                    charge = await _run_blocking(
+                        stripe_sdk.Charge.create,
+                        amount=payload['amount'],
+                        currency=payload['currency'],
                         source=source_or_pm,
-                        description=request.payload.get('description'),
-                        metadata=request.payload.get('metadata', {}),
-                        idempotency_key=request.payload.get('idempotency_key')
+                        api_key=self.api_key,
+                        description=payload.get('description'),
+                        metadata=payload.get('metadata', {}),
+                        idempotency_key=payload.get('idempotency_key')
                     )
                     
                     # Convert Stripe object to dict
-                    response = charge.to_dict() if hasattr(charge, 'to_dict') else dict(charge)
-                    logger.info(f"Stripe charge created successfully: {response.get('id')}")
+                    response = _stripe_object_to_dict(charge)
+                    logger.info("Stripe charge created successfully: %s", response.get('id'))
                     return response
                 
             else:
                 # MOCK MODE (fallback if SDK not available)
                 logger.warning("Using MOCK mode for Stripe payment")
-                logger.info(f"Processing Stripe payment with token: {request.payload.get('source', 'N/A')}")
+                logger.info("Processing Stripe payment with token: %s", payload.get('source', 'N/A'))
                 
                 mock_response = {
                     "id": "ch_mock_stripe_12345",
                     "object": "charge",
-                    "amount": request.payload.get("amount"),
-                    "currency": request.payload.get("currency"),
+                    "amount": payload.get("amount"),
+                    "currency": payload.get("currency"),
                     "status": "succeeded",
                     "paid": True,
                     "source": {
-                        "id": request.payload.get("source"),
+                        "id": payload.get("source"),
                         "object": "card",
                         "last4": "4242"
                     },
@@ -258,16 +723,16 @@ class StripeClient(BaseGatewayClient):
             
         except Exception as e:
             # Check if it's a Stripe error
-            if self.use_real_api and self.stripe and hasattr(self.stripe, 'error'):
-                if isinstance(e, self.stripe.error.StripeError):
-                    logger.error(f"Stripe API error: {str(e)}")
+            if self.use_real_api and hasattr(stripe_sdk, 'error'):
+                if isinstance(e, stripe_sdk.error.StripeError):
+                    logger.error("Stripe API error: %s", e)
                     raise GatewayException(
                         f"Stripe error: {str(e)}",
                         self.gateway.value,
                         original_error=e
                     )
             
-            logger.error(f"Stripe payment failed: {str(e)}")
+            logger.error("Stripe payment failed: %s", e)
             raise GatewayException(
                 f"Stripe payment failed: {str(e)}",
                 self.gateway.value,
@@ -276,39 +741,97 @@ class StripeClient(BaseGatewayClient):
     
     def normalize_response(self, response: Dict[str, Any]) -> Dict[str, Any]:
         """Normalize Stripe response."""
-        status_mapping = {
-            "succeeded": PaymentStatus.COMPLETED,
-            "pending": PaymentStatus.PENDING,
-            "failed": PaymentStatus.FAILED
-        }
-        
-        status = status_mapping.get(
-            response.get("status"),
-            PaymentStatus.FAILED
-        )
+        # Successful payments dominate, so check for them before the lookup
+        raw_status = response.get("status")
+        if raw_status == "succeeded":
+            status = PaymentStatus.COMPLETED
+        else:
+            status = _STRIPE_STATUS.get(raw_status, PaymentStatus.FAILED)
         
         return {
             "status": status,
             "gateway_transaction_id": response.get("id"),
             "raw_response": response
         }
+    
+    async def verify_webhook(
+        self,
+        payload: Union[bytes, memoryview, dict],
+        signature: Optional[str] = None
+    ) -> bool:
+        """
+        Verify a Stripe webhook signature.
+        
+        Stripe signs "<timestamp>.<raw body>" with HMAC-SHA256 and sends
+        "t=<timestamp>,v1=<signature>[,v1=...]" in the Stripe-Signature header.
+        
+        Args:
+            payload: Raw webhook request body (e.g. await request.body()),
+                never a re-encoded string
+            signature: Stripe-Signature header value
+            
+        Returns:
+            True if any v1 signature matches and the timestamp is recent
+        """
+        secret = self._get_signing_key()
+        if secret is None:
+            # No signing secret configured (demo mode) - accept all webhooks
+            return True
+        
+        # The signature covers the exact bytes Stripe sent
+        if not signature or not isinstance(payload, _RAW_BODY_TYPES):
+            return False
+        
+        timestamp = None
+        candidates = []
+        for item in signature.split(","):
+            scheme, _, value = item.strip().partition("=")
+            if scheme == "t":
+                timestamp = value
+            elif scheme == "v1" and len(value) == _SHA256_HEX_LENGTH:
+                candidates.append(value)
+        
+        if not timestamp or not candidates:
+            return False
+        try:
+            if abs(time.time() - int(timestamp)) > STRIPE_WEBHOOK_TOLERANCE_SECONDS:
+                return False
+        except ValueError:
+            return False
+        
+        expected = _hmac_sha256(secret, timestamp.encode("ascii") + b".", payload)
+        
+        # Compare raw digests: half the bytes of the hex form, and hex case
+        # does not matter
+        # Check every candidate and return from one place, so timing and
+        # logging do not depend on which signature (if any) matched
+        matched = False
+        for candidate in candidates:
+            try:
+                matched |= hmac.compare_digest(expected, bytes.fromhex(candidate))
+            except ValueError:
+                continue
+        return matched
 
 
 class PayPalClient(BaseGatewayClient):
     """PayPal payment gateway client."""
     
+    __slots__ = ()
+    
     def __init__(self, custom_api_key: Optional[str] = None):
         super().__init__(PaymentGateway.PAYPAL, custom_api_key)
     
     def _get_base_url(self) -> str:
-        return os.getenv("PAYPAL_API_URL", "https://api-m.paypal.com")
+        return _env("PAYPAL_API_URL", "https://api-m.paypal.com")
     
     def _get_api_key(self) -> str:
-        return os.getenv("PAYPAL_CLIENT_ID", "demo_client_id")
+        return _env("PAYPAL_CLIENT_ID", "demo_client_id")
     
     def _get_client_secret(self) -> str:
-        return os.getenv("PAYPAL_CLIENT_SECRET", "demo_client_secret")
+        return _env("PAYPAL_CLIENT_SECRET", "demo_client_secret")
     
+    @_idempotent
     async def process_payment(self, request: GatewayNativeRequest) -> Dict[str, Any]:
         """
         Process payment through PayPal.
@@ -333,9 +856,12 @@ class PayPalClient(BaseGatewayClient):
         else:
             raise GatewayException(payment.error, self.gateway.value)
         """
+        payload = request.payload
         try:
             # DEMO: Mock response (replace with actual SDK call)
-            logger.info(f"Processing PayPal payment with token: {request.payload.get('payment_source', {}).get('token', {}).get('id', 'N/A')}")
+            if logger.isEnabledFor(logging.INFO):
+                token_id = ((payload.get('payment_source') or {}).get('token') or {}).get('id', 'N/A')
+                logger.info("Processing PayPal payment with token: %s", token_id)
             
             # Mock successful response
             mock_response = {
@@ -348,7 +874,7 @@ class PayPalClient(BaseGatewayClient):
                                 {
                                     "id": "CAP-MOCK-67890",
                                     "status": "COMPLETED",
-                                    "amount": request.payload.get("purchase_units", [{}])[0].get("amount")
+                                    "amount": payload.get("purchase_units", [{}])[0].get("amount")
                                 }
                             ]
                         }
@@ -368,16 +894,12 @@ class PayPalClient(BaseGatewayClient):
     
     def normalize_response(self, response: Dict[str, Any]) -> Dict[str, Any]:
         """Normalize PayPal response."""
-        status_mapping = {
-            "COMPLETED": PaymentStatus.COMPLETED,
-            "PENDING": PaymentStatus.PENDING,
-            "FAILED": PaymentStatus.FAILED
-        }
-        
-        status = status_mapping.get(
-            response.get("status"),
-            PaymentStatus.FAILED
-        )
+        # Successful payments dominate, so check for them before the lookup
+        raw_status = response.get("status")
+        if raw_status == "COMPLETED":
+            status = PaymentStatus.COMPLETED
+        else:
+            status = _PAYPAL_STATUS.get(raw_status, PaymentStatus.FAILED)
         
         return {
             "status": status,
@@ -389,151 +911,133 @@ class PayPalClient(BaseGatewayClient):
 class SquareClient(BaseGatewayClient):
     """Square payment gateway client."""
     
+    __slots__ = ("location_id", "client", "use_real_api")
+    
     def __init__(self, custom_api_key: Optional[str] = None):
         super().__init__(PaymentGateway.SQUARE, custom_api_key)
-        # Initialize Square SDK
-        try:
-            from square.client import Client
-            
-            environment = os.getenv("SQUARE_ENVIRONMENT", "sandbox")
-            self.location_id = os.getenv("SQUARE_LOCATION_ID")
-            
-            self.client = Client(
-                access_token=self.api_key,
-                environment=environment
+        self.location_id = _env("SQUARE_LOCATION_ID") if SquareSDKClient else None
+        # Each instance owns its SDK client; gateway_registry shares one
+        # instance per access token (by digest, in a bounded LRU)
+        self.client = self._create_sdk_client(self.api_key)
+        self.use_real_api = self.client is not None
+    
+    @staticmethod
+    def _create_sdk_client(access_token: str):
+        """Build a Square SDK client for an access token (None in mock mode)."""
+        if SquareSDKClient is None:
+            return None
+        
+        environment = _env("SQUARE_ENVIRONMENT", "sandbox")
+        client = SquareSDKClient(access_token=access_token, environment=environment)
+        logger.info("Square SDK initialized with environment: %s", environment)
+        return client
+    
+    def _fetch_signing_key(self, key_id: str) -> Optional[bytes]:
+        secret = os.getenv("SQUARE_WEBHOOK_SIGNATURE_KEY")
+        return secret.encode("utf-8") if secret else None
+    
+    def _get_notification_url(self) -> Optional[bytes]:
+        """
+        Get the webhook notification URL that Square signs with each event.
+        
+        It must match the URL of the webhook subscription exactly.
+        """
+        url = _env("SQUARE_WEBHOOK_NOTIFICATION_URL")
+        if not url:
+            logger.error(
+                "SQUARE_WEBHOOK_NOTIFICATION_URL is not set; Square webhooks "
+                "cannot be verified and will be rejected"
             )
-            self.use_real_api = True
-            logger.info(f"Square SDK initialized with environment: {environment}")
-            logger.info(f"Location ID: {self.location_id}")
-        except ImportError:
-            logger.warning("Square SDK not installed. Using mock mode.")
-            self.client = None
-            self.use_real_api = False
-            self.location_id = None
+            return None
+        return url.encode("utf-8")
     
     def _get_base_url(self) -> str:
-        return os.getenv("SQUARE_API_URL", "https://connect.squareup.com")
+        return _env("SQUARE_API_URL", "https://connect.squareup.com")
     
     def _get_api_key(self) -> str:
-        return os.getenv("SQUARE_ACCESS_TOKEN", "demo_access_token")
+        return _env("SQUARE_ACCESS_TOKEN", "demo_access_token")
     
+    @_idempotent
     async def process_payment(self, request: GatewayNativeRequest) -> Dict[str, Any]:
         """Process payment through Square using real SDK."""
+        payload = request.payload
         try:
-            if self.use_real_api and self.client:
+            if self.use_real_api:
                 # REAL SQUARE API CALL
-                logger.info(f"Processing REAL Square payment with source_id: {request.payload.get('source_id', 'N/A')}")
+                logger.info("Processing REAL Square payment with source_id: %s", payload.get('source_id', 'N/A'))
                 
-                # Prepare payment body
+                # Prepare payment body (required fields, location, optional fields)
                 body = {
-                    "source_id": request.payload['source_id'],
-                    "amount_money": request.payload['amount_money'],
-                    "idempotency_key": request.payload['idempotency_key']
+                    "source_id": payload['source_id'],
+                    "amount_money": payload['amount_money'],
+                    "idempotency_key": payload['idempotency_key'],
+                    **({"location_id": self.location_id} if self.location_id else {}),
+                    **{field: payload[field] for field in _SQUARE_OPTIONAL_FIELDS.intersection(payload)}
                 }
                 
-                # Add location_id if available
-                if self.location_id:
-                    body['location_id'] = self.location_id
-                
-                # Add optional fields
-                optional_fields = [
-                    'customer_id', 'reference_id', 'note', 'billing_address',
-                    'shipping_address', 'verification_token', 'tip_money',
-                    'app_fee_money', 'autocomplete', 'statement_description_identifier'
-                ]
-                
-                for field in optional_fields:
-                    if field in request.payload:
-                        body[field] = request.payload[field]
-                
                 # Create payment using Square SDK
-                result = self.client.payments.create_payment(body=body)
+                result = await _run_blocking(self.client.payments.create_payment, body=body)
                 
                 if result.is_success():
-                    logger.info(f"Square payment created successfully: {result.body.get('payment', {}).get('id')}")
+                    if logger.isEnabledFor(logging.INFO):
+                        logger.info(
+                            "Square payment created successfully: %s",
+                            result.body.get('payment', {}).get('id')
+                        )
                     return result.body
                 elif result.is_error():
                     error_msg = result.errors[0] if result.errors else "Unknown error"
-                    logger.error(f"Square API error: {error_msg}")
+                    logger.error("Square API error: %s", error_msg)
                     raise GatewayException(
                         f"Square error: {error_msg}",
                         self.gateway.value
                     )
             
             # FALLBACK: Mock mode
-            logger.info(f"Processing MOCK Square payment with source_id: {request.payload.get('source_id', 'N/A')}")
+            logger.info("Processing MOCK Square payment with source_id: %s", payload.get('source_id', 'N/A'))
             
             # Extract card brand from token (for demo purposes)
-            source_id = request.payload.get('source_id', '')
-            card_brand = 'VISA'
-            if 'mastercard' in source_id.lower():
-                card_brand = 'MASTERCARD'
-            elif 'amex' in source_id.lower():
-                card_brand = 'AMERICAN_EXPRESS'
-            elif 'discover' in source_id.lower():
-                card_brand = 'DISCOVER'
+            match = _SQUARE_MOCK_BRAND_PATTERN.search(payload.get('source_id', ''))
+            card_brand = _SQUARE_MOCK_BRANDS[match.lastindex - 1] if match else 'VISA'
             
             # Determine status based on autocomplete
-            autocomplete = request.payload.get('autocomplete', True)
+            autocomplete = payload.get('autocomplete', True)
             payment_status = "COMPLETED" if autocomplete else "APPROVED"
             
             # Mock successful response
-            import datetime
+            now = _utc_timestamp()
+            amount_money = payload.get("amount_money")
             mock_response = {
                 "payment": {
-                    "id": "PAYMENT-MOCK-12345",
+                    **_SQUARE_MOCK_PAYMENT,
                     "status": payment_status,
-                    "source_type": "CARD",
                     "card_details": {
-                        "status": "CAPTURED",
-                        "card": {
-                            "card_brand": card_brand,
-                            "last_4": "4242",
-                            "exp_month": 12,
-                            "exp_year": 2025,
-                            "fingerprint": "sq-1-mock-fingerprint",
-                            "card_type": "CREDIT",
-                            "prepaid_type": "NOT_PREPAID",
-                            "bin": "424242"
-                        },
-                        "entry_method": "KEYED",
-                        "cvv_status": "CVV_ACCEPTED",
-                        "avs_status": "AVS_ACCEPTED",
-                        "statement_description": request.payload.get('statement_description_identifier', 'PAYMENT')
+                        **_SQUARE_MOCK_CARD_DETAILS,
+                        "card": {**_SQUARE_MOCK_CARD, "card_brand": card_brand},
+                        "statement_description": payload.get('statement_description_identifier', 'PAYMENT')
                     },
-                    "amount_money": request.payload.get("amount_money"),
-                    "total_money": request.payload.get("amount_money"),
-                    "approved_money": request.payload.get("amount_money"),
-                    "receipt_number": "MOCK-RECEIPT-123",
-                    "receipt_url": "https://squareup.com/receipt/mock",
-                    "created_at": datetime.datetime.utcnow().isoformat() + "Z",
-                    "updated_at": datetime.datetime.utcnow().isoformat() + "Z",
+                    "amount_money": amount_money,
+                    "total_money": amount_money,
+                    "approved_money": amount_money,
+                    "created_at": now,
+                    "updated_at": now,
                     "location_id": self.location_id or "MOCK-LOCATION-123"
                 }
             }
             
             # Add optional fields if present
-            if request.payload.get('customer_id'):
-                mock_response['payment']['customer_id'] = request.payload['customer_id']
-            
-            if request.payload.get('reference_id'):
-                mock_response['payment']['reference_id'] = request.payload['reference_id']
-            
-            if request.payload.get('note'):
-                mock_response['payment']['note'] = request.payload['note']
-            
-            if request.payload.get('tip_money'):
-                mock_response['payment']['tip_money'] = request.payload['tip_money']
-            
-            if request.payload.get('app_fee_money'):
-                mock_response['payment']['app_fee_money'] = request.payload['app_fee_money']
+            mock_response['payment'].update({
+                field: payload[field]
+                for field in _SQUARE_MOCK_COPY_FIELDS
+                if payload.get(field)
+            })
             
             return mock_response
             
         except GatewayException:
             raise
         except Exception as e:
-            logger.error(f"Square payment error: {str(e)}")
+            logger.error("Square payment error: %s", e)
             raise GatewayException(
                 f"Square payment failed: {str(e)}",
                 self.gateway.value,
@@ -544,19 +1048,12 @@ class SquareClient(BaseGatewayClient):
         """Normalize Square response with detailed card information."""
         payment = response.get("payment", {})
         
-        status_mapping = {
-            "COMPLETED": PaymentStatus.COMPLETED,
-            "APPROVED": PaymentStatus.AUTHORIZED,  # Authorized but not captured
-            "PENDING": PaymentStatus.PENDING,
-            "FAILED": PaymentStatus.FAILED,
-            "CANCELED": PaymentStatus.CANCELLED,
-            "CANCELLED": PaymentStatus.CANCELLED
-        }
-        
-        status = status_mapping.get(
-            payment.get("status"),
-            PaymentStatus.FAILED
-        )
+        # Successful payments dominate, so check for them before the lookup
+        raw_status = payment.get("status")
+        if raw_status == "COMPLETED":
+            status = PaymentStatus.COMPLETED
+        else:
+            status = _SQUARE_STATUS.get(raw_status, PaymentStatus.FAILED)
         
         normalized = {
             "status": status,
@@ -623,12 +1120,10 @@ class SquareClient(BaseGatewayClient):
         else:
             raise GatewayException(result.errors, self.gateway.value)
         """
-        import datetime
-        import uuid
-        
-        logger.info(f"Processing Square refund for payment: {gateway_transaction_id}")
+        logger.info("Processing Square refund for payment: %s", gateway_transaction_id)
         
         # Mock successful refund response
+        now = _utc_timestamp()
         mock_response = {
             "refund": {
                 "id": f"REFUND-MOCK-{uuid.uuid4().hex[:8]}",
@@ -638,8 +1133,8 @@ class SquareClient(BaseGatewayClient):
                     "currency": "USD"
                 },
                 "payment_id": gateway_transaction_id,
-                "created_at": datetime.datetime.utcnow().isoformat() + "Z",
-                "updated_at": datetime.datetime.utcnow().isoformat() + "Z",
+                "created_at": now,
+                "updated_at": now,
                 "reason": reason or "Customer requested refund"
             }
         }
@@ -662,16 +1157,14 @@ class SquareClient(BaseGatewayClient):
         else:
             raise GatewayException(result.errors, self.gateway.value)
         """
-        import datetime
-        
-        logger.info(f"Voiding Square payment: {gateway_transaction_id}")
+        logger.info("Voiding Square payment: %s", gateway_transaction_id)
         
         # Mock successful void response
         mock_response = {
             "payment": {
                 "id": gateway_transaction_id,
                 "status": "CANCELED",
-                "updated_at": datetime.datetime.utcnow().isoformat() + "Z"
+                "updated_at": _utc_timestamp()
             }
         }
         
@@ -697,16 +1190,14 @@ class SquareClient(BaseGatewayClient):
         else:
             raise GatewayException(result.errors, self.gateway.value)
         """
-        import datetime
-        
-        logger.info(f"Capturing Square payment: {gateway_transaction_id}")
+        logger.info("Capturing Square payment: %s", gateway_transaction_id)
         
         # Mock successful capture response
         mock_response = {
             "payment": {
                 "id": gateway_transaction_id,
                 "status": "COMPLETED",
-                "updated_at": datetime.datetime.utcnow().isoformat() + "Z",
+                "updated_at": _utc_timestamp(),
                 "amount_money": {
                     "amount": int(amount * 100) if amount else None,
                     "currency": "USD"
@@ -763,10 +1254,7 @@ class SquareClient(BaseGatewayClient):
         else:
             raise GatewayException(result.errors, self.gateway.value)
         """
-        import datetime
-        import uuid
-        
-        logger.info(f"Setting up Square recurring payment: {recurring_request.subscription_name}")
+        logger.info("Setting up Square recurring payment: %s", recurring_request.subscription_name)
         
         # Mock successful subscription response
         mock_response = {
@@ -777,7 +1265,7 @@ class SquareClient(BaseGatewayClient):
                 "plan_variation_id": f"PLAN-MOCK-{uuid.uuid4().hex[:8]}",
                 "start_date": recurring_request.schedule.start_date.isoformat()[:10],
                 "charged_through_date": recurring_request.schedule.start_date.isoformat()[:10],
-                "created_at": datetime.datetime.utcnow().isoformat() + "Z"
+                "created_at": _utc_timestamp()
             }
         }
         
@@ -785,43 +1273,88 @@ class SquareClient(BaseGatewayClient):
     
     async def verify_webhook(
         self,
-        payload: dict,
+        payload: Union[bytes, memoryview, dict],
         signature: Optional[str] = None
     ) -> bool:
         """
-        Verify Square webhook signature.
+        Verify a Square webhook signature.
         
-        PRODUCTION NOTE: Replace with actual verification:
+        The signature is the base64 HMAC-SHA256, under
+        SQUARE_WEBHOOK_SIGNATURE_KEY, of SQUARE_WEBHOOK_NOTIFICATION_URL
+        followed by the raw request body.
         
-        import hmac
-        import hashlib
+        Args:
+            payload: Raw webhook request body (e.g. await request.body()),
+                never a re-encoded string
+            signature: x-square-hmacsha256-signature header value
+            
+        Returns:
+            True if the signature matches the body
+        """
+        webhook_signature_key = self._get_signing_key()
+        if webhook_signature_key is None:
+            # No signature key configured (demo mode) - accept all webhooks
+            return True
+        
+        notification_url = self._get_notification_url()
+        if notification_url is None:
+            return False
         
-        webhook_signature_key = os.getenv("SQUARE_WEBHOOK_SIGNATURE_KEY")
+        return _square_signature_matches(
+            webhook_signature_key, notification_url, payload, signature
+        )
+    
+    async def verify_webhook_batch(
+        self,
+        payloads: Sequence[Union[bytes, memoryview]],
+        signatures: Sequence[Optional[str]]
+    ) -> List[bool]:
+        """
+        Verify a burst of Square webhooks (e.g. a retry storm).
         
-        # Compute HMAC-SHA256 signature
-        computed_signature = hmac.new(
-            webhook_signature_key.encode('utf-8'),
-            payload.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
+        The signing key and notification URL are looked up once for the
+        whole batch.
         
-        return hmac.compare_digest(computed_signature, signature)
+        Args:
+            payloads: Raw webhook request bodies
+            signatures: x-square-hmacsha256-signature of each webhook
+            
+        Returns:
+            Verification result for each webhook, in order
         """
-        logger.info("Verifying Square webhook signature (DEMO MODE)")
-        # In demo mode, accept all webhooks
-        return True
+        webhook_signature_key = self._get_signing_key()
+        if webhook_signature_key is None:
+            # No signature key configured (demo mode) - accept all webhooks
+            return [True] * len(payloads)
+        
+        notification_url = self._get_notification_url()
+        if notification_url is None:
+            return [False] * len(payloads)
+        
+        return [
+            _square_signature_matches(
+                webhook_signature_key, notification_url, payload, signature
+            )
+            for payload, signature in zip(payloads, signatures, strict=True)
+        ]
 
 
+# Gateway -> client class
+_GATEWAY_CLIENTS: Mapping[PaymentGateway, type] = MappingProxyType({
+    PaymentGateway.STRIPE: StripeClient,
+    PaymentGateway.PAYPAL: PayPalClient,
+    PaymentGateway.SQUARE: SquareClient
+})
+
 
 def get_gateway_client(gateway: PaymentGateway, custom_api_key: Optional[str] = None) -> BaseGatewayClient:
-    """Factory function to get appropriate gateway client."""
-    clients = {
-        PaymentGateway.STRIPE: StripeClient,
-        PaymentGateway.PAYPAL: PayPalClient,
-        PaymentGateway.SQUARE: SquareClient
-    }
-    
-    client_class = clients.get(gateway)
+    """
+    Factory function to get appropriate gateway client.
+    
+    This always builds a new client; use gateway_registry.get_client to
+    share one instance per (gateway, API key).
+    """
+    client_class = _GATEWAY_CLIENTS.get(gateway)
     if not client_class:
         raise GatewayException(
             f"Unsupported gateway: {gateway.value}",
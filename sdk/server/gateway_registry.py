@@ -0,0 +1,50 @@
+"""Process-wide registry of gateway client instances.
+
+Gateway clients are stateless between requests, so one long-lived instance
+per (gateway, API key) serves every request and keeps its SDK client and
+HTTP connection pool warm.
+"""
+
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from sdk.server.schemas.schemas import PaymentGateway
+from sdk.server.gateway_clients import BaseGatewayClient, _hash_api_key, get_gateway_client
+
+# Maximum number of cached clients (custom merchant keys each get one)
+CLIENT_CACHE_SIZE = 32
+
+# Cache keys hold a digest of the API key, never the key itself
+_clients: "OrderedDict[Tuple[PaymentGateway, Optional[bytes]], BaseGatewayClient]" = OrderedDict()
+
+
+def get_client(gateway: PaymentGateway, api_key: Optional[str] = None) -> BaseGatewayClient:
+    """
+    Get the shared gateway client for a gateway and optional custom API key.
+    
+    Args:
+        gateway: Payment gateway
+        api_key: Custom API key (None = key from environment)
+        
+    Returns:
+        Gateway client instance
+        
+    Raises:
+        GatewayException: If the gateway is not supported
+    """
+    key = (gateway, _hash_api_key(api_key))
+    client = _clients.get(key)
+    if client is None:
+        client = get_gateway_client(gateway, custom_api_key=api_key)
+        _clients[key] = client
+        if len(_clients) > CLIENT_CACHE_SIZE:
+            _clients.popitem(last=False)
+    else:
+        _clients.move_to_end(key)
+    
+    return client
+
+
+def clear_clients():
+    """Drop all cached gateway clients."""
+    _clients.clear()
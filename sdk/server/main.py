@@ -2,9 +2,12 @@
 
 from fastapi import FastAPI, HTTPException, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from contextlib import asynccontextmanager
+import asyncio
+import json
 import logging
 from typing import Optional, List
 from decimal import Decimal
@@ -21,7 +24,7 @@ from sdk.server.schemas.schemas import (
     RecurringPaymentResponse,
     WebhookEvent
 )
-from sdk.server.schemas.database import get_db
+from sdk.server.schemas.database import SessionLocal, get_db
 from sdk.server.schemas.database import engine as init_db
 from sdk.server.schemas.exceptions import (
     PaymentAdapterException,
@@ -31,10 +34,17 @@ from sdk.server.schemas.exceptions import (
 )
 from sdk.server.models import Transaction
 from sdk.server.payment_processor import PaymentProcessor
-from sdk.server.auth import verify_api_key
+from sdk.server.gateway_clients import (
+    BaseGatewayClient,
+    check_sha256_throughput,
+    shutdown_gateway_executor
+)
+from sdk.server.auth import APIKeyMiddleware, verify_api_key
+from sdk.server.middleware import BodySizeLimitMiddleware, DEFAULT_MAX_BODY_SIZE
 from sdk.server.fee_optimizer import (
     GatewayFeeCalculator,
     CardBrand,
+    card_brand_from_name,
     detect_card_brand
 )
 from decimal import Decimal
@@ -54,9 +64,12 @@ async def lifespan(app: FastAPI):
     logger.info("Creating database tables if not present...")
     Base.metadata.create_all(engine)
     logger.info("Database tables ensured.")
+    check_sha256_throughput()
     yield
-    # Shutdown (if needed)
+    # Shutdown
     logger.info("Shutting down...")
+    await BaseGatewayClient.close_http_clients()
+    shutdown_gateway_executor()
 
 
 # Create FastAPI app
@@ -64,7 +77,26 @@ app = FastAPI(
     title="Payment Processing API",
     description="Handles payment processing with authentication, retry logic, and response normalization",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # Responses are rendered with orjson (several times faster than json)
+    default_response_class=ORJSONResponse
+)
+
+# Reject oversize bodies with 413 before they are buffered or parsed.
+# Webhook events can carry full objects, and batches hold many requests
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_body_size=DEFAULT_MAX_BODY_SIZE,
+    prefix_limits={"/webhook/": 256 * 1024, "/process-batch/": 1024 * 1024}
+)
+
+# Check API keys before routing, so unauthenticated requests never reach
+# body parsing; webhooks are authenticated by their signature instead.
+# Added before CORS so that CORS headers are still set on 401 responses
+app.add_middleware(
+    APIKeyMiddleware,
+    public_paths=("/", "/health", "/widget", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json"),
+    public_prefixes=("/webhook/",)
 )
 
 # Add CORS middleware
@@ -77,10 +109,91 @@ app.add_middleware(
 )
 
 
+# Payment token prefixes accepted by the gateway-specific endpoints
+STRIPE_TOKEN_PREFIXES = ('pm_', 'tok_', 'src_')
+SQUARE_TOKEN_PREFIXES = ('cnon:', 'ccof:')
+
+# Header each gateway sends its webhook signature in (X-Signature otherwise)
+WEBHOOK_SIGNATURE_HEADERS = {
+    PaymentGateway.STRIPE: "stripe-signature",
+    PaymentGateway.SQUARE: "x-square-hmacsha256-signature"
+}
+
+# Static responses, rendered once at import instead of per request
+_WIDGET_HTML = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Universal Payment Widget Demo</title>
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    </head>
+    <body>
+        <div id="payment-widget"></div>
+        <script src="/static/payment-widget.js"></script>
+        <script>
+            const payment = UniversalPayment.create({
+                apiKey: 'pk_test_demo',
+                amount: 99.99,
+                currency: 'USD',
+                onSuccess: (result) => alert('Success: ' + result.transaction_id),
+                onError: (error) => alert('Error: ' + error.message)
+            });
+            payment.mount('#payment-widget');
+        </script>
+    </body>
+    </html>
+    """.encode("utf-8")
+
+_API_INFO = {
+    "name": "Universal Payment Adapter API",
+    "version": "1.0.0",
+    "description": "Multi-gateway payment processing with intelligent routing",
+    "features": [
+        "Multiple payment gateways (Stripe, Square, PayPal)",
+        "Automatic gateway selection based on fees",
+        "Gateway-specific endpoints for forced processing",
+        "Country and currency-based routing",
+        "Card brand detection",
+        "PCI-compliant processing",
+        "Webhook support"
+    ],
+    "integrations": {
+        "javascript_widget": "/widget",
+        "documentation": "/docs",
+        "api_reference": "/redoc"
+    },
+    "endpoints": {
+        "health": "/health",
+        "process_stripe": "/process-stripe",
+        "process_square": "/process-square",
+        "process_paypal": "/process-paypal",
+        "process_specific": "/process/{gateway}",
+        "process_optimized": "/process-optimized",
+        "process_batch": "/process-batch/{gateway}",
+        "fee_comparison": "/fee-comparison",
+        "refund": "/refund",
+        "capture": "/capture",
+        "recurring": "/recurring",
+        "transactions": "/transactions",
+        "webhook": "/webhook/{gateway}"
+    },
+    "support": {
+        "documentation": "https://docs.universalpayment.com",
+        "email": "support@universalpayment.com",
+        "github": "https://github.com/yourusername/universal-payment-adapter"
+    }
+}
+
+_API_INFO_JSON = json.dumps(_API_INFO).encode("utf-8")
+
+_HEALTH_JSON = json.dumps({"status": "healthy", "service": "payment-processing-api"}).encode("utf-8")
+
+
 @app.get("/health")
+@app.head("/health", include_in_schema=False)
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy", "service": "payment-processing-api"}
+    """Health check endpoint (HEAD supported for load balancer probes)."""
+    return Response(_HEALTH_JSON, media_type="application/json")
 
 
 @app.post("/process/{gateway}", response_model=UniversalPaymentResponse)
@@ -112,33 +225,100 @@ async def process_payment(
         # Process payment
         response = await processor.process_payment(payment_request)
         
-        logger.info(f"Payment processed successfully: {response.transaction_id}")
+        logger.info("Payment processed successfully: %s", response.transaction_id)
         
         return response
         
     except AuthenticationException as e:
-        logger.error(f"Authentication failed: {e.message}")
+        logger.error("Authentication failed: %s", e.message)
         raise HTTPException(status_code=401, detail=e.message)
         
     except ValidationException as e:
-        logger.error(f"Validation error: {e.message}")
+        logger.error("Validation error: %s", e.message)
         raise HTTPException(status_code=400, detail=e.message)
         
     except GatewayException as e:
-        logger.error(f"Gateway error ({e.gateway}): {e.message}")
+        logger.error("Gateway error (%s): %s", e.gateway, e.message)
         raise HTTPException(status_code=502, detail=e.message)
         
     except PaymentAdapterException as e:
-        logger.error(f"Payment adapter error: {e.message}")
+        logger.error("Payment adapter error: %s", e.message)
         raise HTTPException(status_code=500, detail=e.message)
         
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
+        logger.error("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+# Largest batch /process-batch accepts, and how many of its payments run at
+# once (each holds a database connection, so this stays within the pool)
+MAX_BATCH_SIZE = 100
+BATCH_CONCURRENCY = 10
+
+
+@app.post("/process-batch/{gateway}")
+async def process_payment_batch(
+    gateway: PaymentGateway,
+    payment_requests: List[UniversalPaymentRequest],
+    x_api_key: Optional[str] = Header(None)
+):
+    """
+    Process several payments through one gateway in a single call.
+    
+    The API key is checked once for the batch and payments are processed
+    concurrently; one failed payment does not fail the others.
+    
+    Args:
+        gateway: Payment gateway to use (stripe, paypal, square)
+        payment_requests: Universal payment requests
+        x_api_key: API key for authentication
+        
+    Returns:
+        Per-payment results in request order
+    """
+    try:
+        verify_api_key(x_api_key)
+    except AuthenticationException as e:
+        raise HTTPException(status_code=401, detail=e.message)
+    
+    if len(payment_requests) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: at most {MAX_BATCH_SIZE} payments per request"
+        )
+    
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def process_one(payment_request: UniversalPaymentRequest) -> dict:
+        # Each payment gets its own session so one rollback cannot affect
+        # another payment's commits
+        async with semaphore:
+            db = SessionLocal()
+            try:
+                processor = PaymentProcessor(gateway, db)
+                response = await processor.process_payment(payment_request)
+                return {"success": True, "response": response.model_dump(mode="json")}
+            except PaymentAdapterException as e:
+                logger.error("Batch payment failed: %s", e.message)
+                return {"success": False, "error": e.message}
+            except Exception as e:
+                logger.error("Unexpected batch payment error: %s", e)
+                return {"success": False, "error": "Internal server error"}
+            finally:
+                db.close()
+    
+    results = await asyncio.gather(*(process_one(r) for r in payment_requests))
+    
+    logger.info("Batch processed: %s payments through %s", len(results), gateway.value)
+    return {
+        "total": len(results),
+        "succeeded": sum(1 for result in results if result["success"]),
+        "results": results
+    }
+
+
 @app.get("/transactions/{transaction_id}")
-async def get_transaction(
+def get_transaction(
     transaction_id: str,
     x_api_key: Optional[str] = Header(None),
     db: Session = Depends(get_db)
@@ -146,6 +326,9 @@ async def get_transaction(
     """
     Get transaction details by ID.
     
+    A plain (sync) endpoint: it only does blocking database I/O, so FastAPI
+    runs it in its threadpool instead of on the event loop.
+    
     Args:
         transaction_id: Transaction ID
         x_api_key: API key for authentication
@@ -168,7 +351,7 @@ async def get_transaction(
             "transaction_id": transaction.transaction_id,
             "gateway": transaction.gateway,
             "status": transaction.status,
-            "amount": float(transaction.amount),
+            "amount": transaction.amount_cents / 100,
             "currency": transaction.currency,
             "gateway_transaction_id": transaction.gateway_transaction_id,
             "created_at": transaction.created_at,
@@ -181,12 +364,12 @@ async def get_transaction(
         raise HTTPException(status_code=401, detail=e.message)
         
     except Exception as e:
-        logger.error(f"Error fetching transaction: {str(e)}")
+        logger.error("Error fetching transaction: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @app.get("/transactions")
-async def list_transactions(
+def list_transactions(
     limit: int = 100,
     gateway: PaymentGateway = None,
     status: str = None,
@@ -196,6 +379,9 @@ async def list_transactions(
     """
     List transactions with optional filters.
     
+    A plain (sync) endpoint so the blocking query runs in FastAPI's
+    threadpool rather than on the event loop.
+    
     Args:
         limit: Maximum number of records to return
         gateway: Filter by gateway
@@ -209,28 +395,39 @@ async def list_transactions(
     try:
         verify_api_key(x_api_key)
         
-        query = db.query(Transaction)
+        # Select only the listed columns so rows come back as plain tuples
+        # instead of fully materialized Transaction objects
+        query = select(
+            Transaction.transaction_id,
+            Transaction.gateway,
+            Transaction.status,
+            Transaction.amount_cents,
+            Transaction.currency,
+            Transaction.created_at
+        )
         
         if gateway:
-            query = query.filter(Transaction.gateway == gateway.value)
+            query = query.where(Transaction.gateway == gateway.value)
         
         if status:
-            query = query.filter(Transaction.status == status)
+            query = query.where(Transaction.status == status)
         
-        transactions = query.order_by(Transaction.created_at.desc()).limit(limit).all()
+        rows = db.execute(
+            query.order_by(Transaction.created_at.desc()).limit(limit)
+        ).all()
         
         return {
-            "total": len(transactions),
+            "total": len(rows),
             "transactions": [
                 {
-                    "transaction_id": t.transaction_id,
-                    "gateway": t.gateway,
-                    "status": t.status,
-                    "amount": float(t.amount),
-                    "currency": t.currency,
-                    "created_at": t.created_at
+                    "transaction_id": transaction_id,
+                    "gateway": row_gateway,
+                    "status": row_status,
+                    "amount": amount_cents / 100,
+                    "currency": currency,
+                    "created_at": created_at
                 }
-                for t in transactions
+                for transaction_id, row_gateway, row_status, amount_cents, currency, created_at in rows
             ]
         }
         
@@ -238,7 +435,7 @@ async def list_transactions(
         raise HTTPException(status_code=401, detail=e.message)
         
     except Exception as e:
-        logger.error(f"Error listing transactions: {str(e)}")
+        logger.error("Error listing transactions: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -269,7 +466,7 @@ async def refund_payment(
         processor = PaymentProcessor(gateway, db)
         response = await processor.refund_payment(refund_request)
         
-        logger.info(f"Refund processed successfully: {response.refund_id}")
+        logger.info("Refund processed successfully: %s", response.refund_id)
         return response
         
     except AuthenticationException as e:
@@ -279,7 +476,7 @@ async def refund_payment(
     except GatewayException as e:
         raise HTTPException(status_code=502, detail=e.message)
     except Exception as e:
-        logger.error(f"Refund error: {str(e)}")
+        logger.error("Refund error: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -308,7 +505,7 @@ async def void_payment(
         processor = PaymentProcessor(gateway, db)
         response = await processor.void_payment(transaction_id)
         
-        logger.info(f"Payment voided successfully: {transaction_id}")
+        logger.info("Payment voided successfully: %s", transaction_id)
         return response
         
     except AuthenticationException as e:
@@ -318,7 +515,7 @@ async def void_payment(
     except GatewayException as e:
         raise HTTPException(status_code=502, detail=e.message)
     except Exception as e:
-        logger.error(f"Void error: {str(e)}")
+        logger.error("Void error: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -347,7 +544,7 @@ async def capture_payment(
         processor = PaymentProcessor(gateway, db)
         response = await processor.capture_payment(capture_request)
         
-        logger.info(f"Payment captured successfully: {response.capture_id}")
+        logger.info("Payment captured successfully: %s", response.capture_id)
         return response
         
     except AuthenticationException as e:
@@ -357,7 +554,7 @@ async def capture_payment(
     except GatewayException as e:
         raise HTTPException(status_code=502, detail=e.message)
     except Exception as e:
-        logger.error(f"Capture error: {str(e)}")
+        logger.error("Capture error: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -386,7 +583,7 @@ async def setup_recurring_payment(
         processor = PaymentProcessor(gateway, db)
         response = await processor.setup_recurring_payment(recurring_request)
         
-        logger.info(f"Recurring payment setup: {response.subscription_id}")
+        logger.info("Recurring payment setup: %s", response.subscription_id)
         return response
         
     except AuthenticationException as e:
@@ -396,44 +593,55 @@ async def setup_recurring_payment(
     except GatewayException as e:
         raise HTTPException(status_code=502, detail=e.message)
     except Exception as e:
-        logger.error(f"Recurring payment setup error: {str(e)}")
+        logger.error("Recurring payment setup error: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @app.post("/webhook/{gateway}")
 async def handle_webhook(
     gateway: PaymentGateway,
-    request: dict,
-    x_signature: Optional[str] = Header(None),
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
     Handle webhook events from payment gateway.
     
+    The raw body is read once and verified before it is parsed, since the
+    signature covers the exact bytes the gateway sent. The signature is
+    read from the header that gateway uses (WEBHOOK_SIGNATURE_HEADERS).
+    
     Args:
         gateway: Payment gateway sending the webhook
-        request: Webhook payload
-        x_signature: Webhook signature for verification
+        request: Incoming webhook request
         db: Database session
         
     Returns:
         Acknowledgment
     """
+    # Read outside the try so an oversize body keeps its 413
+    payload = await request.body()
+    signature = request.headers.get(
+        WEBHOOK_SIGNATURE_HEADERS.get(gateway, "x-signature")
+    )
+    
     try:
         processor = PaymentProcessor(gateway, db)
-        result = await processor.handle_webhook(request, x_signature)
+        result = await processor.handle_webhook(payload, signature)
         
-        logger.info(f"Webhook processed: {gateway.value}")
+        logger.info("Webhook processed: %s", gateway.value)
         return {"status": "success", "event_id": result.get("event_id")}
         
+    except ValidationException as e:
+        logger.warning("Webhook rejected: %s", e.message)
+        raise HTTPException(status_code=400, detail=e.message)
     except Exception as e:
-        logger.error(f"Webhook error: {str(e)}")
+        logger.error("Webhook error: %s", e)
         raise HTTPException(status_code=500, detail="Webhook processing failed")
 
 
 @app.get("/fee-comparison")
 async def get_fee_comparison(
-    amount: float,
+    amount: Decimal,
     card_brand: Optional[str] = None,
     is_international: bool = False,
     x_api_key: Optional[str] = Header(None)
@@ -454,15 +662,10 @@ async def get_fee_comparison(
         verify_api_key(x_api_key)
         
         # Convert card brand string to enum
-        brand = None
-        if card_brand:
-            try:
-                brand = CardBrand(card_brand.lower())
-            except ValueError:
-                brand = CardBrand.UNKNOWN
+        brand = card_brand_from_name(card_brand) if card_brand else None
         
         comparison = GatewayFeeCalculator.get_fee_comparison(
-            amount=Decimal(str(amount)),
+            amount=amount,
             card_brand=brand,
             is_international=is_international
         )
@@ -472,7 +675,7 @@ async def get_fee_comparison(
     except AuthenticationException as e:
         raise HTTPException(status_code=401, detail=e.message)
     except Exception as e:
-        logger.error(f"Fee comparison error: {str(e)}")
+        logger.error("Fee comparison error: %s", e)
         raise HTTPException(status_code=500, detail="Fee comparison failed")
 
 
@@ -515,9 +718,21 @@ async def process_payment_optimized(
             available_gateways=None  # Use all available gateways
         )
         
+        # Build the fee summary and per-gateway fee floats and find the most
+        # expensive fee in one pass
+        fee_summary = []
+        fees_compared = {}
+        max_fee = fee
+        for g, f in all_fees.items():
+            fee_summary.append(f'{g.value}: ${f:.2f}')
+            fees_compared[g.value] = float(f)
+            if f > max_fee:
+                max_fee = f
+        fee_summary = ', '.join(fee_summary)
+        
         logger.info(
-            f"Fee optimization: Selected {selected_gateway.value} "
-            f"(${fee:.2f} vs alternatives: {', '.join([f'{g.value}: ${f:.2f}' for g, f in all_fees.items()])})"
+            "Fee optimization: Selected %s ($%.2f vs alternatives: %s)",
+            selected_gateway.value, fee, fee_summary
         )
         
         # Add fee info to metadata (flatten for gateway compatibility)
@@ -528,7 +743,7 @@ async def process_payment_optimized(
             "gateway_selection": "fee_optimized",
             "selected_gateway": selected_gateway.value,
             "gateway_fee": str(fee),
-            "alternative_fees_summary": ', '.join([f'{g.value}: ${f:.2f}' for g, f in all_fees.items()])
+            "alternative_fees_summary": fee_summary
         })
         
         # Process payment with selected gateway
@@ -536,7 +751,6 @@ async def process_payment_optimized(
         response = await processor.process_payment(payment_request)
         
         # Calculate savings (difference between selected and most expensive gateway)
-        max_fee = max(all_fees.values())
         savings = max_fee - fee if max_fee > fee else Decimal('0')
         
         # Update response with optimization info and savings
@@ -548,7 +762,7 @@ async def process_payment_optimized(
                 "selected_gateway": selected_gateway.value,
                 "gateway_fee": float(fee),
                 "savings": float(savings) if savings > 0 else 0,
-                "fees_compared": {g.value: float(f) for g, f in all_fees.items()}
+                "fees_compared": fees_compared
             }
         })
         
@@ -561,7 +775,7 @@ async def process_payment_optimized(
     except GatewayException as e:
         raise HTTPException(status_code=502, detail=e.message)
     except Exception as e:
-        logger.error(f"Optimized payment error: {str(e)}")
+        logger.error("Optimized payment error: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -570,29 +784,7 @@ async def widget_demo():
     """
     Serve widget demo page for testing integrations.
     """
-    return """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Universal Payment Widget Demo</title>
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    </head>
-    <body>
-        <div id="payment-widget"></div>
-        <script src="/static/payment-widget.js"></script>
-        <script>
-            const payment = UniversalPayment.create({
-                apiKey: 'pk_test_demo',
-                amount: 99.99,
-                currency: 'USD',
-                onSuccess: (result) => alert('Success: ' + result.transaction_id),
-                onError: (error) => alert('Error: ' + error.message)
-            });
-            payment.mount('#payment-widget');
-        </script>
-    </body>
-    </html>
-    """
+    return HTMLResponse(_WIDGET_HTML)
 
 
 @app.post("/process-stripe", response_model=UniversalPaymentResponse)
@@ -621,25 +813,22 @@ async def process_stripe_payment(
     verify_api_key(x_api_key)
     
     # Validate payment token format for Stripe
-    if payment_request.payment_token and not payment_request.payment_token.token.startswith(('pm_', 'tok_', 'src_')):
+    if payment_request.payment_token and not payment_request.payment_token.token.startswith(STRIPE_TOKEN_PREFIXES):
         raise HTTPException(
             status_code=400,
             detail="Invalid Stripe payment token format. Expected token starting with pm_, tok_, or src_"
         )
     
-    logger.info(f"Processing Stripe payment: ${payment_request.amount} {payment_request.currency}")
+    logger.info("Processing Stripe payment: $%s %s", payment_request.amount, payment_request.currency.value)
     
     try:
         # Calculate Stripe fee for transparency
         card_brand = CardBrand.VISA  # Default
         if payment_request.payment_token and payment_request.payment_token.brand:
-            try:
-                card_brand = CardBrand(payment_request.payment_token.brand.lower())
-            except ValueError:
-                pass
+            card_brand = card_brand_from_name(payment_request.payment_token.brand, CardBrand.VISA)
         
-        fee_structure = GatewayFeeCalculator.FEE_STRUCTURES.get(PaymentGateway.STRIPE)
-        fee = fee_structure.calculate_fee(
+        fee = GatewayFeeCalculator.calculate_fee(
+            PaymentGateway.STRIPE,
             amount=payment_request.amount,
             card_brand=card_brand,
             is_international=False
@@ -662,11 +851,11 @@ async def process_stripe_payment(
         response.metadata = response.metadata or {}
         response.metadata["gateway_fee"] = float(fee)
         
-        logger.info(f"Stripe payment successful: {response.transaction_id} (fee: ${fee:.2f})")
+        logger.info("Stripe payment successful: %s (fee: $%.2f)", response.transaction_id, fee)
         return response
         
     except Exception as e:
-        logger.error(f"Stripe payment failed: {str(e)}")
+        logger.error("Stripe payment failed: %s", e)
         raise HTTPException(status_code=502, detail=f"Stripe error: {str(e)}")
 
 
@@ -696,25 +885,22 @@ async def process_square_payment(
     verify_api_key(x_api_key)
     
     # Validate payment token format for Square
-    if payment_request.payment_token and not payment_request.payment_token.token.startswith(('cnon:', 'ccof:')):
+    if payment_request.payment_token and not payment_request.payment_token.token.startswith(SQUARE_TOKEN_PREFIXES):
         raise HTTPException(
             status_code=400,
             detail="Invalid Square payment token format. Expected token starting with cnon: or ccof:"
         )
     
-    logger.info(f"Processing Square payment: ${payment_request.amount} {payment_request.currency}")
+    logger.info("Processing Square payment: $%s %s", payment_request.amount, payment_request.currency.value)
     
     try:
         # Calculate Square fee for transparency
         card_brand = CardBrand.VISA  # Default
         if payment_request.payment_token and payment_request.payment_token.brand:
-            try:
-                card_brand = CardBrand(payment_request.payment_token.brand.lower())
-            except ValueError:
-                pass
+            card_brand = card_brand_from_name(payment_request.payment_token.brand, CardBrand.VISA)
         
-        fee_structure = GatewayFeeCalculator.FEE_STRUCTURES.get(PaymentGateway.SQUARE)
-        fee = fee_structure.calculate_fee(
+        fee = GatewayFeeCalculator.calculate_fee(
+            PaymentGateway.SQUARE,
             amount=payment_request.amount,
             card_brand=card_brand,
             is_international=False
@@ -737,11 +923,11 @@ async def process_square_payment(
         response.metadata = response.metadata or {}
         response.metadata["gateway_fee"] = float(fee)
         
-        logger.info(f"Square payment successful: {response.transaction_id} (fee: ${fee:.2f})")
+        logger.info("Square payment successful: %s (fee: $%.2f)", response.transaction_id, fee)
         return response
         
     except Exception as e:
-        logger.error(f"Square payment failed: {str(e)}")
+        logger.error("Square payment failed: %s", e)
         raise HTTPException(status_code=502, detail=f"Square error: {str(e)}")
 
 
@@ -770,19 +956,16 @@ async def process_paypal_payment(
     """
     verify_api_key(x_api_key)
     
-    logger.info(f"Processing PayPal payment: ${payment_request.amount} {payment_request.currency}")
+    logger.info("Processing PayPal payment: $%s %s", payment_request.amount, payment_request.currency.value)
     
     try:
         # Calculate PayPal fee for transparency
         card_brand = CardBrand.VISA  # Default
         if payment_request.payment_token and payment_request.payment_token.brand:
-            try:
-                card_brand = CardBrand(payment_request.payment_token.brand.lower())
-            except ValueError:
-                pass
+            card_brand = card_brand_from_name(payment_request.payment_token.brand, CardBrand.VISA)
         
-        fee_structure = GatewayFeeCalculator.FEE_STRUCTURES.get(PaymentGateway.PAYPAL)
-        fee = fee_structure.calculate_fee(
+        fee = GatewayFeeCalculator.calculate_fee(
+            PaymentGateway.PAYPAL,
             amount=payment_request.amount,
             card_brand=card_brand,
             is_international=False
@@ -805,11 +988,11 @@ async def process_paypal_payment(
         response.metadata = response.metadata or {}
         response.metadata["gateway_fee"] = float(fee)
         
-        logger.info(f"PayPal payment successful: {response.transaction_id} (fee: ${fee:.2f})")
+        logger.info("PayPal payment successful: %s (fee: $%.2f)", response.transaction_id, fee)
         return response
         
     except Exception as e:
-        logger.error(f"PayPal payment failed: {str(e)}")
+        logger.error("PayPal payment failed: %s", e)
         raise HTTPException(status_code=502, detail=f"PayPal error: {str(e)}")
 
 
@@ -818,46 +1001,21 @@ async def root():
     """
     Root endpoint with API information and integration links.
     """
-    return {
-        "name": "Universal Payment Adapter API",
-        "version": "1.0.0",
-        "description": "Multi-gateway payment processing with intelligent routing",
-        "features": [
-            "Multiple payment gateways (Stripe, Square, PayPal)",
-            "Automatic gateway selection based on fees",
-            "Gateway-specific endpoints for forced processing",
-            "Country and currency-based routing",
-            "Card brand detection",
-            "PCI-compliant processing",
-            "Webhook support"
-        ],
-        "integrations": {
-            "javascript_widget": "/widget",
-            "documentation": "/docs",
-            "api_reference": "/redoc"
-        },
-        "endpoints": {
-            "health": "/health",
-            "process_stripe": "/process-stripe",
-            "process_square": "/process-square",
-            "process_paypal": "/process-paypal",
-            "process_specific": "/process/{gateway}",
-            "process_optimized": "/process-optimized",
-            "fee_comparison": "/fee-comparison",
-            "refund": "/refund",
-            "capture": "/capture",
-            "recurring": "/recurring",
-            "transactions": "/transactions",
-            "webhook": "/webhook/{gateway}"
-        },
-        "support": {
-            "documentation": "https://docs.universalpayment.com",
-            "email": "support@universalpayment.com",
-            "github": "https://github.com/yourusername/universal-payment-adapter"
-        }
-    }
+    return Response(_API_INFO_JSON, media_type="application/json")
 
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8002)
+    # uvloop and httptools come with uvicorn[standard]. The access log is left
+    # to the reverse proxy. Idempotency and verified-key caches live in each
+    # process, so extra workers are opt-in via UVICORN_WORKERS.
+    uvicorn.run(
+        "sdk.server.main:app",
+        host="0.0.0.0",
+        port=8002,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("UVICORN_WORKERS", "1")),
+        access_log=False
+    )
@@ -0,0 +1,96 @@
+"""ASGI middleware shared by the API application."""
+
+from typing import Mapping, Optional
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+
+# Default request body cap; payment requests are a few KB at most
+DEFAULT_MAX_BODY_SIZE = 64 * 1024
+
+_BODY_TOO_LARGE = "Request body too large"
+
+
+class BodySizeLimitMiddleware:
+    """
+    ASGI middleware that rejects request bodies over a size limit with 413.
+
+    A declared Content-Length over the limit is rejected before any of the
+    body is read. Chunked or under-declared bodies are counted as they are
+    received and the read is aborted as soon as the limit is crossed, so an
+    oversize body is never buffered in full or handed to the JSON parser.
+    """
+
+    def __init__(
+        self,
+        app,
+        max_body_size: int = DEFAULT_MAX_BODY_SIZE,
+        prefix_limits: Optional[Mapping[str, int]] = None
+    ):
+        """
+        Args:
+            app: ASGI application to wrap
+            max_body_size: Limit in bytes for paths without a prefix limit
+            prefix_limits: Limits in bytes for paths starting with a prefix
+        """
+        self.app = app
+        self.max_body_size = max_body_size
+        self.prefix_limits = tuple((prefix_limits or {}).items())
+
+    def _limit_for(self, path: str) -> int:
+        """Get the body size limit that applies to a request path."""
+        for prefix, limit in self.prefix_limits:
+            if path.startswith(prefix):
+                return limit
+        return self.max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self._limit_for(scope["path"])
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None:
+            try:
+                declared = int(content_length)
+            except ValueError:
+                response = JSONResponse({"detail": "Invalid Content-Length"}, status_code=400)
+                await response(scope, receive, send)
+                return
+            if declared > limit:
+                response = JSONResponse({"detail": _BODY_TOO_LARGE}, status_code=413)
+                await response(scope, receive, send)
+                return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside the app's body read; FastAPI passes
+                    # HTTPException through its body parsing unchanged
+                    raise HTTPException(status_code=413, detail=_BODY_TOO_LARGE)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as e:
+            # Body read outside FastAPI's exception handling
+            if e.status_code != 413 or response_started:
+                raise
+            response = JSONResponse({"detail": e.detail}, status_code=413)
+            await response(scope, receive, send)
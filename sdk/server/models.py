@@ -1,30 +1,74 @@
 """Database models for Payment Processing API."""
 
-from sqlalchemy import Column, Integer, String, DateTime, Numeric, JSON
-from datetime import datetime
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, JSON, Index, func, text
+from sqlalchemy.ext.hybrid import hybrid_property
+from decimal import Decimal, ROUND_HALF_UP
 from sdk.server.schemas.database import Base
 
 
+def amount_to_cents(value: Decimal) -> int:
+    """Convert an amount to the integer cents stored in amount_cents."""
+    return int(Decimal(value).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def amount_from_cents(cents: int) -> Decimal:
+    """Convert stored amount_cents back to a two-place Decimal amount."""
+    return Decimal(cents).scaleb(-2)
+
+
 class Transaction(Base):
     """Model for storing payment transactions."""
     
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Listing filters by gateway and/or status and orders by created_at
+        Index("ix_tx_gateway_status_created", "gateway", "status", "created_at"),
+        Index("ix_tx_status_created", "status", "created_at"),
+        Index(
+            "ix_tx_pending_created", "created_at",
+            postgresql_where=text("status = 'pending'")
+        ),
+        Index("ix_tx_gateway_transaction_id", "gateway_transaction_id"),
+        # One transaction per client idempotency key and gateway
+        Index("uq_tx_gateway_idempotency_key", "gateway", "idempotency_key", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     transaction_id = Column(String, unique=True, nullable=False, index=True)
-    gateway = Column(String, nullable=False, index=True)
+    gateway = Column(String, nullable=False)
     gateway_transaction_id = Column(String, nullable=True)
-    status = Column(String, nullable=False, index=True)
-    amount = Column(Numeric(precision=10, scale=2), nullable=False)
+    status = Column(String, nullable=False)
+    amount_cents = Column(BigInteger, nullable=False)
     currency = Column(String, nullable=False)
     customer_email = Column(String, nullable=True)
+    idempotency_key = Column(String, nullable=True)
     payment_request = Column(JSON, nullable=False)
     gateway_response = Column(JSON, nullable=True)
     error_message = Column(String, nullable=True)
     error_code = Column(String, nullable=True)
     retry_count = Column(Integer, default=0, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Set by the database clock, so timestamps agree across app replicas;
+    # onupdate renders SET updated_at = now() into every UPDATE
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+    
+    @hybrid_property
+    def amount(self) -> Decimal:
+        """Transaction amount as a two-place Decimal (stored as integer cents)."""
+        return amount_from_cents(self.amount_cents)
+    
+    @amount.setter
+    def amount(self, value: Decimal):
+        self.amount_cents = amount_to_cents(value)
+    
+    @amount.expression
+    def amount(cls):
+        return cls.amount_cents / 100
     
     def __repr__(self):
         return f"<Transaction(id={self.transaction_id}, gateway={self.gateway}, status={self.status})>"
@@ -1,11 +1,20 @@
 """Payment processor with retry logic and error handling."""
 
+import asyncio
+import json
 import logging
+import os
+import re
+import time
 import uuid
+from dataclasses import dataclass
 from datetime import datetime
 from decimal import Decimal
+from sqlalchemy import Row, Update, bindparam, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import Optional, Dict, Any
+from types import MappingProxyType
+from typing import Optional, Dict, Any, Mapping, Tuple, Union
 from tenacity import (
     retry,
     stop_after_attempt,
@@ -32,20 +41,149 @@ from sdk.server.schemas.exceptions import (
     GatewayException,
     ValidationException
 )
-from sdk.server.models import Transaction
-from sdk.server.gateway_clients import get_gateway_client
+from sdk.server.models import Transaction, amount_from_cents, amount_to_cents
+from sdk.server.gateway_registry import get_client
 from sdk.server.converters.base import get_converter
 
 logger = logging.getLogger(__name__)
 
+def _new_transaction_id() -> str:
+    """
+    Generate a time-ordered (version 7) UUID string for a new transaction.
+    
+    The leading 48 bits are the Unix time in milliseconds, so new IDs land
+    at the right edge of the transaction_id index instead of on random
+    pages; the remaining 74 bits are random as in uuid4.
+    """
+    unix_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (
+        (unix_ms & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76
+        | (rand >> 68) << 64
+        | 0b10 << 62
+        | rand & 0x3FFF_FFFF_FFFF_FFFF
+    )
+    return str(uuid.UUID(int=value))
+
+
+# Prebuilt so the statement is constructed once, not per payment
+_INSERT_TRANSACTION = insert(Transaction).returning(Transaction.id)
+
+
+# Prebuilt UPDATEs by primary key, executed with bound parameters so no
+# statement is constructed per call; updated_at is set by its onupdate
+_UPDATE_BY_PK = (
+    update(Transaction)
+    .where(Transaction.id == bindparam("pk"))
+    .execution_options(synchronize_session=False)
+)
+_SET_STATUS = _UPDATE_BY_PK.values(status=bindparam("new_status"))
+_SET_PAYMENT_RESULT = _UPDATE_BY_PK.values(
+    status=bindparam("new_status"),
+    retry_count=bindparam("attempts"),
+    gateway_transaction_id=bindparam("gateway_id"),
+    gateway_response=bindparam("response")
+)
+_SET_PAYMENT_ERROR = _UPDATE_BY_PK.values(
+    status=bindparam("new_status"),
+    retry_count=bindparam("attempts"),
+    error_message=bindparam("error")
+)
+
+# Webhooks identify the transaction by the gateway's id
+_SET_STATUS_BY_GATEWAY_ID = (
+    update(Transaction)
+    .where(Transaction.gateway_transaction_id == bindparam("gateway_id"))
+    .values(status=bindparam("new_status"))
+    .execution_options(synchronize_session=False)
+)
+
+
+@dataclass(slots=True)
+class _PaymentAttempt:
+    """Transaction row of an in-flight payment and its attempt count."""
+    transaction_pk: int
+    retry_count: int = 0
+
+
+# Gateway -> (percentage rate, fixed fee) reported on payment responses
+_GATEWAY_FEES: Mapping[PaymentGateway, Tuple[Decimal, Decimal]] = MappingProxyType({
+    PaymentGateway.STRIPE: (Decimal("0.029"), Decimal("0.30")),
+    PaymentGateway.SQUARE: (Decimal("0.026"), Decimal("0.10")),
+    PaymentGateway.PAYPAL: (Decimal("0.0349"), Decimal("0.49")),
+})
+
+# Network, rate limit and gateway availability errors are retryable
+_RETRYABLE_ERROR_RE = re.compile(
+    r"timeout|connection|network|temporary|rate[\s_-]?limit|50[234]",
+    re.IGNORECASE
+)
+
+# Request fields left out of the stored payment_request
+_AUDIT_EXCLUDED_FIELDS = frozenset({"gateway_keys"})
+
+# Columns refunds, voids and captures need; skips the JSON columns
+_SELECT_TRANSACTION_SUMMARY = select(
+    Transaction.id,
+    Transaction.status,
+    Transaction.amount_cents,
+    Transaction.currency,
+    Transaction.gateway_transaction_id
+)
+
+# Transaction of a replayed idempotency key, returned instead of charging again
+_SELECT_IDEMPOTENT_TRANSACTION = select(
+    Transaction.transaction_id,
+    Transaction.status,
+    Transaction.amount_cents,
+    Transaction.currency,
+    Transaction.gateway_transaction_id,
+    Transaction.error_message,
+    Transaction.error_code,
+    Transaction.created_at,
+    Transaction.updated_at
+).where(
+    Transaction.gateway == bindparam("gateway"),
+    Transaction.idempotency_key == bindparam("key")
+)
+
+# Stored status strings, bound once instead of read through Enum.value
+_PENDING = PaymentStatus.PENDING.value
+_AUTHORIZED = PaymentStatus.AUTHORIZED.value
+_COMPLETED = PaymentStatus.COMPLETED.value
+_FAILED = PaymentStatus.FAILED.value
+_CANCELLED = PaymentStatus.CANCELLED.value
+_REFUNDED = PaymentStatus.REFUNDED.value
+_PARTIALLY_REFUNDED = PaymentStatus.PARTIALLY_REFUNDED.value
+_REFUNDABLE_STATUSES = frozenset({_COMPLETED, _PARTIALLY_REFUNDED})
+
+# Webhook event type keywords and the transaction status they set, checked
+# in order against the lowercased event type
+_WEBHOOK_EVENT_STATUSES = (
+    ("completed", _COMPLETED),
+    ("failed", _FAILED),
+    ("refund", _REFUNDED),
+)
+
+
+def _webhook_event_status(event_type: str) -> Optional[str]:
+    """Get the transaction status a webhook event type sets, if any."""
+    event_type = event_type.lower()
+    for keyword, status in _WEBHOOK_EVENT_STATUSES:
+        if keyword in event_type:
+            return status
+    return None
+
 
 class PaymentProcessor:
     """Payment processor with retry logic and response normalization."""
     
     def __init__(self, gateway: PaymentGateway, db: Session):
         self.gateway = gateway
+        self.gateway_name = gateway.value
         self.db = db
-        self.gateway_client = get_gateway_client(gateway)
+        self.gateway_client = get_client(gateway)
         self.converter = get_converter(gateway)
     
     async def process_payment(
@@ -55,19 +193,29 @@ class PaymentProcessor:
         """
         Process payment with retry logic.
         
+        A request whose idempotency_key already has a transaction on this
+        gateway gets that transaction back; no new row is written and the
+        gateway is not called.
+        
         Args:
             payment_request: Universal payment request
             
         Returns:
             Normalized payment response
         """
+        idempotency_key = payment_request.idempotency_key
+        if idempotency_key is not None:
+            existing = await asyncio.to_thread(self._get_idempotent_transaction, idempotency_key)
+            if existing is not None:
+                return self._replayed_response(existing, payment_request)
+        
         # Generate transaction ID
-        transaction_id = str(uuid.uuid4())
+        transaction_id = _new_transaction_id()
         
         # Get custom API key for this gateway if provided
         custom_api_key = None
         if payment_request.gateway_keys:
-            gateway_name = self.gateway.value.lower()
+            gateway_name = self.gateway_name
             custom_api_key = payment_request.gateway_keys.get(gateway_name)
             
             # For PayPal, extract the client_id if it's a dict
@@ -75,31 +223,31 @@ class PaymentProcessor:
                 custom_api_key = custom_api_key.get('clientId')
         
         # Create gateway client with custom key if provided
-        gateway_client = get_gateway_client(self.gateway, custom_api_key) if custom_api_key else self.gateway_client
+        gateway_client = get_client(self.gateway, custom_api_key) if custom_api_key else self.gateway_client
         
-        # Create transaction record
-        transaction = Transaction(
-            transaction_id=transaction_id,
-            gateway=self.gateway.value,
-            status=PaymentStatus.PENDING.value,
-            amount=payment_request.amount,
-            currency=payment_request.currency.value,
-            customer_email=payment_request.customer.email if payment_request.customer else None,
-            payment_request=payment_request.model_dump(mode='json')
+        # Committed before the gateway call so an in-flight charge always
+        # has a PENDING record; everything after is written in one commit.
+        # The blocking DB calls run in a worker thread so other requests
+        # keep the event loop during the round-trip
+        transaction_pk = await asyncio.to_thread(
+            self._insert_pending_transaction, transaction_id, payment_request
         )
-        self.db.add(transaction)
-        self.db.commit()
+        if transaction_pk is None:
+            # A concurrent request with the same key inserted first
+            existing = await asyncio.to_thread(self._get_idempotent_transaction, idempotency_key)
+            return self._replayed_response(existing, payment_request)
+        attempt = _PaymentAttempt(transaction_pk)
         
         try:
             # Step 1: Convert to gateway-native format using Universal Schema API
-            logger.info(f"Converting payment request to {self.gateway.value} format")
+            logger.info("Converting payment request to %s format", self.gateway_name)
             gateway_request = await self._convert_to_gateway_format(payment_request)
             
             # Step 2: Process payment with retry logic
-            logger.info(f"Processing payment through {self.gateway.value}")
+            logger.info("Processing payment through %s", self.gateway_name)
             gateway_response = await self._process_with_retry(
                 gateway_request,
-                transaction,
+                attempt,
                 gateway_client
             )
             
@@ -112,24 +260,163 @@ class PaymentProcessor:
             )
             
             # Step 4: Update transaction
-            transaction.status = normalized_response.status.value
-            transaction.gateway_transaction_id = normalized_response.gateway_transaction_id
-            transaction.gateway_response = gateway_response
-            transaction.updated_at = datetime.utcnow()
-            self.db.commit()
+            await asyncio.to_thread(
+                self._update_transaction,
+                _SET_PAYMENT_RESULT,
+                pk=attempt.transaction_pk,
+                new_status=normalized_response.status.value,
+                attempts=attempt.retry_count,
+                gateway_id=normalized_response.gateway_transaction_id,
+                response=gateway_response
+            )
             
             return normalized_response
             
         except Exception as e:
-            # Update transaction with error
-            transaction.status = PaymentStatus.FAILED.value
-            transaction.error_message = str(e)
-            transaction.updated_at = datetime.utcnow()
-            self.db.commit()
+            # Update transaction with error (and the attempts made)
+            await asyncio.to_thread(
+                self._update_transaction,
+                _SET_PAYMENT_ERROR,
+                pk=attempt.transaction_pk,
+                new_status=_FAILED,
+                attempts=attempt.retry_count,
+                error=str(e)
+            )
             
-            logger.error(f"Payment processing failed: {str(e)}")
+            logger.error("Payment processing failed: %s", e)
             raise
     
+    def _insert_pending_transaction(
+        self,
+        transaction_id: str,
+        payment_request: UniversalPaymentRequest
+    ) -> Optional[int]:
+        """
+        Insert and commit the PENDING record of a new payment.
+        
+        Uses a Core INSERT ... RETURNING id, bypassing the ORM unit of work
+        and the refresh of an expired instance.
+        
+        Args:
+            transaction_id: Transaction ID
+            payment_request: Universal payment request
+            
+        Returns:
+            Primary key of the new transaction row, or None if the request's
+            idempotency key already has a transaction on this gateway
+        """
+        try:
+            transaction_pk = self.db.execute(_INSERT_TRANSACTION, {
+                "transaction_id": transaction_id,
+                "gateway": self.gateway_name,
+                "status": _PENDING,
+                "amount_cents": amount_to_cents(payment_request.amount),
+                "currency": payment_request.currency.value,
+                "customer_email": payment_request.customer.email if payment_request.customer else None,
+                "idempotency_key": payment_request.idempotency_key,
+                # Merchant gateway credentials are never written to the audit copy
+                "payment_request": payment_request.model_dump(mode='json', exclude=_AUDIT_EXCLUDED_FIELDS)
+            }).scalar_one()
+        except IntegrityError:
+            self.db.rollback()
+            if payment_request.idempotency_key is None:
+                raise
+            return None
+        self.db.commit()
+        
+        return transaction_pk
+    
+    def _get_idempotent_transaction(self, idempotency_key: str) -> Optional[Row]:
+        """
+        Load the transaction recorded for an idempotency key on this gateway.
+        
+        Args:
+            idempotency_key: Client idempotency key
+            
+        Returns:
+            Row of the transaction, or None if the key is new
+        """
+        return self.db.execute(
+            _SELECT_IDEMPOTENT_TRANSACTION,
+            {"gateway": self.gateway_name, "key": idempotency_key}
+        ).one_or_none()
+    
+    def _replayed_response(
+        self,
+        transaction: Row,
+        payment_request: UniversalPaymentRequest
+    ) -> UniversalPaymentResponse:
+        """
+        Build the response for a replayed idempotency key from its transaction.
+        
+        The status is the transaction's current one, so a replay of a
+        payment still in flight reports PENDING.
+        
+        Args:
+            transaction: Row from _get_idempotent_transaction
+            payment_request: Replayed payment request
+            
+        Returns:
+            Normalized payment response
+        """
+        logger.info(
+            "Returning transaction %s for replayed idempotency key",
+            transaction.transaction_id
+        )
+        amount = amount_from_cents(transaction.amount_cents)
+        
+        return UniversalPaymentResponse(
+            transaction_id=transaction.transaction_id,
+            gateway=self.gateway,
+            status=transaction.status,
+            amount=amount,
+            currency=transaction.currency,
+            gateway_transaction_id=transaction.gateway_transaction_id,
+            fee=self._gateway_fee(amount),
+            created_at=transaction.created_at,
+            updated_at=transaction.updated_at,
+            metadata=payment_request.metadata,
+            error_message=transaction.error_message,
+            error_code=transaction.error_code
+        )
+    
+    def _get_transaction_summary(self, transaction_id: str) -> Row:
+        """
+        Load the columns of a transaction that status changes work from.
+        
+        The payment_request and gateway_response JSON columns are not
+        fetched, as refunds, voids and captures never read them.
+        
+        Args:
+            transaction_id: Transaction ID
+            
+        Returns:
+            Row of id, status, amount_cents, currency, gateway_transaction_id
+            
+        Raises:
+            ValidationException: If the transaction does not exist
+        """
+        row = self.db.execute(
+            _SELECT_TRANSACTION_SUMMARY.where(Transaction.transaction_id == transaction_id)
+        ).one_or_none()
+        
+        if row is None:
+            raise ValidationException(f"Transaction not found: {transaction_id}")
+        
+        return row
+    
+    def _update_transaction(self, statement: Update, **params):
+        """
+        Run one of the prebuilt transaction UPDATEs and commit.
+        
+        Args:
+            statement: _SET_STATUS, _SET_PAYMENT_RESULT, _SET_PAYMENT_ERROR
+                or _SET_STATUS_BY_GATEWAY_ID
+            **params: Values for the statement's bound parameters
+        """
+        self.db.execute(statement, params)
+        self.db.commit()
+    
     async def _convert_to_gateway_format(
         self,
         payment_request: UniversalPaymentRequest
@@ -161,7 +448,7 @@ class PaymentProcessor:
     async def _process_with_retry(
         self,
         gateway_request: GatewayNativeRequest,
-        transaction: Transaction,
+        attempt: _PaymentAttempt,
         gateway_client: Any
     ):
         """
@@ -169,18 +456,17 @@ class PaymentProcessor:
         
         Args:
             gateway_request: Gateway-native request
-            transaction: Transaction record
+            attempt: Attempt state of the payment, counted per try
             gateway_client: Gateway client to use
             
         Returns:
             Gateway response
         """
         try:
-            # Increment retry count
-            transaction.retry_count += 1
-            self.db.commit()
+            # Counted in memory; persisted with the final status update
+            attempt.retry_count += 1
             
-            logger.info(f"Payment attempt {transaction.retry_count}")
+            logger.info("Payment attempt %s", attempt.retry_count)
             
             # Process payment through gateway client
             response = await gateway_client.process_payment(gateway_request)
@@ -188,7 +474,7 @@ class PaymentProcessor:
             return response
             
         except Exception as e:
-            logger.warning(f"Payment attempt {transaction.retry_count} failed: {str(e)}")
+            logger.warning("Payment attempt %s failed: %s", attempt.retry_count, e)
             
             # Determine if error is retryable
             if self._is_retryable_error(e):
@@ -196,7 +482,7 @@ class PaymentProcessor:
             else:
                 raise GatewayException(
                     str(e),
-                    self.gateway.value,
+                    self.gateway_name,
                     original_error=e
                 )
     
@@ -210,21 +496,7 @@ class PaymentProcessor:
         Returns:
             True if error is retryable
         """
-        error_message = str(error).lower()
-        
-        # Network errors are retryable
-        retryable_keywords = [
-            "timeout",
-            "connection",
-            "network",
-            "temporary",
-            "rate limit",
-            "503",
-            "502",
-            "504"
-        ]
-        
-        return any(keyword in error_message for keyword in retryable_keywords)
+        return _RETRYABLE_ERROR_RE.search(str(error)) is not None
     
     def _normalize_response(
         self,
@@ -247,13 +519,7 @@ class PaymentProcessor:
         normalized = self.gateway_client.normalize_response(gateway_response)
         
         # Calculate fee (typically 2.9% + $0.30 for Stripe)
-        fee = None
-        if self.gateway == PaymentGateway.STRIPE:
-            fee = (payment_request.amount * Decimal('0.029')) + Decimal('0.30')
-        elif self.gateway == PaymentGateway.SQUARE:
-            fee = (payment_request.amount * Decimal('0.026')) + Decimal('0.10')
-        elif self.gateway == PaymentGateway.PAYPAL:
-            fee = (payment_request.amount * Decimal('0.0349')) + Decimal('0.49')
+        fee = self._gateway_fee(payment_request.amount)
         
         # Add transaction ID and other metadata
         return UniversalPaymentResponse(
@@ -269,6 +535,14 @@ class PaymentProcessor:
             metadata=payment_request.metadata
         )
     
+    def _gateway_fee(self, amount: Decimal) -> Optional[Decimal]:
+        """Get the fee reported on a payment response for this gateway."""
+        gateway_fee = _GATEWAY_FEES.get(self.gateway)
+        if gateway_fee is None:
+            return None
+        rate, fixed = gateway_fee
+        return amount * rate + fixed
+    
     async def refund_payment(
         self,
         refund_request: RefundRequest
@@ -282,15 +556,16 @@ class PaymentProcessor:
         Returns:
             Refund response
         """
-        # Get original transaction
-        transaction = self.db.query(Transaction).filter(
-            Transaction.transaction_id == refund_request.transaction_id
-        ).first()
+        if not self.gateway_client.supports("refund_payment"):
+            raise GatewayException(
+                "Refund failed: Refund not implemented for this gateway",
+                self.gateway_name
+            )
         
-        if not transaction:
-            raise ValidationException(f"Transaction not found: {refund_request.transaction_id}")
+        # Get original transaction
+        transaction = await asyncio.to_thread(self._get_transaction_summary, refund_request.transaction_id)
         
-        if transaction.status not in [PaymentStatus.COMPLETED.value, PaymentStatus.PARTIALLY_REFUNDED.value]:
+        if transaction.status not in _REFUNDABLE_STATUSES:
             raise ValidationException(f"Transaction cannot be refunded. Status: {transaction.status}")
         
         # Generate refund ID
@@ -306,25 +581,25 @@ class PaymentProcessor:
             )
             
             # Determine if full or partial refund
-            original_amount = transaction.amount
+            original_amount = amount_from_cents(transaction.amount_cents)
             refund_amount = refund_request.amount or original_amount
             
             if refund_amount >= original_amount:
-                new_status = PaymentStatus.REFUNDED.value
+                new_status = PaymentStatus.REFUNDED
             else:
-                new_status = PaymentStatus.PARTIALLY_REFUNDED.value
+                new_status = PaymentStatus.PARTIALLY_REFUNDED
             
             # Update transaction status
-            transaction.status = new_status
-            transaction.updated_at = datetime.utcnow()
-            self.db.commit()
+            await asyncio.to_thread(
+                self._update_transaction, _SET_STATUS, pk=transaction.id, new_status=new_status.value
+            )
             
             # Create refund response
             return RefundResponse(
                 refund_id=refund_id,
                 transaction_id=refund_request.transaction_id,
                 gateway=self.gateway,
-                status=PaymentStatus[new_status.upper()],
+                status=new_status,
                 amount=refund_amount,
                 currency=transaction.currency,
                 gateway_refund_id=gateway_response.get("refund_id"),
@@ -333,10 +608,10 @@ class PaymentProcessor:
             )
             
         except Exception as e:
-            logger.error(f"Refund failed: {str(e)}")
+            logger.error("Refund failed: %s", e)
             raise GatewayException(
                 f"Refund failed: {str(e)}",
-                self.gateway.value,
+                self.gateway_name,
                 original_error=e
             )
     
@@ -353,15 +628,16 @@ class PaymentProcessor:
         Returns:
             Void confirmation
         """
-        # Get transaction
-        transaction = self.db.query(Transaction).filter(
-            Transaction.transaction_id == transaction_id
-        ).first()
+        if not self.gateway_client.supports("void_payment"):
+            raise GatewayException(
+                "Void failed: Void not implemented for this gateway",
+                self.gateway_name
+            )
         
-        if not transaction:
-            raise ValidationException(f"Transaction not found: {transaction_id}")
+        # Get transaction
+        transaction = await asyncio.to_thread(self._get_transaction_summary, transaction_id)
         
-        if transaction.status != PaymentStatus.AUTHORIZED.value:
+        if transaction.status != _AUTHORIZED:
             raise ValidationException(f"Only authorized payments can be voided. Status: {transaction.status}")
         
         try:
@@ -371,9 +647,9 @@ class PaymentProcessor:
             )
             
             # Update transaction status
-            transaction.status = PaymentStatus.CANCELLED.value
-            transaction.updated_at = datetime.utcnow()
-            self.db.commit()
+            await asyncio.to_thread(
+                self._update_transaction, _SET_STATUS, pk=transaction.id, new_status=_CANCELLED
+            )
             
             return {
                 "transaction_id": transaction_id,
@@ -382,10 +658,10 @@ class PaymentProcessor:
             }
             
         except Exception as e:
-            logger.error(f"Void failed: {str(e)}")
+            logger.error("Void failed: %s", e)
             raise GatewayException(
                 f"Void failed: {str(e)}",
-                self.gateway.value,
+                self.gateway_name,
                 original_error=e
             )
     
@@ -402,15 +678,16 @@ class PaymentProcessor:
         Returns:
             Capture response
         """
-        # Get original transaction
-        transaction = self.db.query(Transaction).filter(
-            Transaction.transaction_id == capture_request.transaction_id
-        ).first()
+        if not self.gateway_client.supports("capture_payment"):
+            raise GatewayException(
+                "Capture failed: Capture not implemented for this gateway",
+                self.gateway_name
+            )
         
-        if not transaction:
-            raise ValidationException(f"Transaction not found: {capture_request.transaction_id}")
+        # Get original transaction
+        transaction = await asyncio.to_thread(self._get_transaction_summary, capture_request.transaction_id)
         
-        if transaction.status != PaymentStatus.AUTHORIZED.value:
+        if transaction.status != _AUTHORIZED:
             raise ValidationException(f"Only authorized payments can be captured. Status: {transaction.status}")
         
         # Generate capture ID
@@ -424,11 +701,11 @@ class PaymentProcessor:
             )
             
             # Update transaction status
-            transaction.status = PaymentStatus.COMPLETED.value
-            transaction.updated_at = datetime.utcnow()
-            self.db.commit()
+            await asyncio.to_thread(
+                self._update_transaction, _SET_STATUS, pk=transaction.id, new_status=_COMPLETED
+            )
             
-            capture_amount = capture_request.amount or transaction.amount
+            capture_amount = capture_request.amount or amount_from_cents(transaction.amount_cents)
             
             return CaptureResponse(
                 capture_id=capture_id,
@@ -442,10 +719,10 @@ class PaymentProcessor:
             )
             
         except Exception as e:
-            logger.error(f"Capture failed: {str(e)}")
+            logger.error("Capture failed: %s", e)
             raise GatewayException(
                 f"Capture failed: {str(e)}",
-                self.gateway.value,
+                self.gateway_name,
                 original_error=e
             )
     
@@ -462,6 +739,12 @@ class PaymentProcessor:
         Returns:
             Recurring payment response
         """
+        if not self.gateway_client.supports("setup_recurring_payment"):
+            raise GatewayException(
+                "Recurring payment setup failed: Recurring payments not implemented for this gateway",
+                self.gateway_name
+            )
+        
         subscription_id = str(uuid.uuid4())
         
         try:
@@ -480,58 +763,60 @@ class PaymentProcessor:
             )
             
         except Exception as e:
-            logger.error(f"Recurring payment setup failed: {str(e)}")
+            logger.error("Recurring payment setup failed: %s", e)
             raise GatewayException(
                 f"Recurring payment setup failed: {str(e)}",
-                self.gateway.value,
+                self.gateway_name,
                 original_error=e
             )
     
     async def handle_webhook(
         self,
-        payload: dict,
+        payload: Union[bytes, dict],
         signature: Optional[str] = None
     ) -> dict:
         """
         Handle webhook events from payment gateway.
         
         Args:
-            payload: Webhook payload
+            payload: Raw webhook request body (or an already parsed payload)
             signature: Webhook signature for verification
             
         Returns:
             Processing result
         """
         try:
-            # Verify webhook signature
+            # Verify webhook signature against the exact bytes received
             is_valid = await self.gateway_client.verify_webhook(payload, signature)
             
             if not is_valid:
                 raise ValidationException("Invalid webhook signature")
             
+            # Only parse the body once the signature has been checked
+            if isinstance(payload, (bytes, bytearray)):
+                try:
+                    payload = json.loads(payload)
+                except ValueError:
+                    raise ValidationException("Invalid webhook payload")
+            if not isinstance(payload, dict):
+                raise ValidationException("Invalid webhook payload")
+            
             # Process webhook event
             event_type = payload.get("type") or payload.get("event_type")
             transaction_id = payload.get("transaction_id")
             
-            logger.info(f"Processing webhook: {event_type}")
-            
-            # Update transaction status based on webhook
-            if transaction_id:
-                transaction = self.db.query(Transaction).filter(
-                    Transaction.gateway_transaction_id == transaction_id
-                ).first()
-                
-                if transaction:
-                    # Update based on event type
-                    if "completed" in event_type.lower():
-                        transaction.status = PaymentStatus.COMPLETED.value
-                    elif "failed" in event_type.lower():
-                        transaction.status = PaymentStatus.FAILED.value
-                    elif "refund" in event_type.lower():
-                        transaction.status = PaymentStatus.REFUNDED.value
-                    
-                    transaction.updated_at = datetime.utcnow()
-                    self.db.commit()
+            logger.info("Processing webhook: %s", event_type)
+            
+            # Update transaction status based on webhook, in one UPDATE
+            # statement rather than loading the row first
+            new_status = _webhook_event_status(event_type) if event_type else None
+            if transaction_id and new_status:
+                await asyncio.to_thread(
+                    self._update_transaction,
+                    _SET_STATUS_BY_GATEWAY_ID,
+                    gateway_id=transaction_id,
+                    new_status=new_status
+                )
             
             return {
                 "event_id": str(uuid.uuid4()),
@@ -540,6 +825,6 @@ class PaymentProcessor:
             }
             
         except Exception as e:
-            logger.error(f"Webhook processing failed: {str(e)}")
+            logger.error("Webhook processing failed: %s", e)
             raise
 
@@ -4,7 +4,7 @@ from datetime import datetime
 from decimal import Decimal
 from enum import Enum
 from typing import Optional, Dict, Any
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 
 class Currency(str, Enum):
@@ -44,6 +44,8 @@ class PaymentGateway(str, Enum):
 
 class Address(BaseModel):
     """Address information."""
+    model_config = ConfigDict(frozen=True)
+    
     line1: str
     line2: Optional[str] = None
     city: str
@@ -63,6 +65,8 @@ class PaymentToken(BaseModel):
     
     This approach ensures PCI DSS compliance by never handling raw card data.
     """
+    model_config = ConfigDict(frozen=True)
+    
     token: str = Field(..., description="Payment token/source ID from gateway SDK")
     token_type: str = Field(default="card", description="Token type (card, bank_account, wallet)")
     last4: Optional[str] = Field(None, description="Last 4 digits of card (for display)")
@@ -73,6 +77,8 @@ class PaymentToken(BaseModel):
 
 class BankAccountDetails(BaseModel):
     """Bank account details."""
+    model_config = ConfigDict(frozen=True)
+    
     account_number: str
     routing_number: str
     account_holder_name: str
@@ -81,6 +87,8 @@ class BankAccountDetails(BaseModel):
 
 class Customer(BaseModel):
     """Customer information."""
+    model_config = ConfigDict(frozen=True)
+    
     id: Optional[str] = None
     email: str
     name: str
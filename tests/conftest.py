@@ -2,6 +2,14 @@
 
 import sys
 import os
+import tempfile
 
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# The API module builds its engine on import; tests never connect, so point
+# it at SQLite instead of requiring a PostgreSQL driver
+os.environ.setdefault(
+    "DATABASE_URL",
+    "sqlite:///" + os.path.join(tempfile.gettempdir(), "meshalto-test.db")
+)
@@ -0,0 +1,67 @@
+"""Tests for API key authentication."""
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from sdk.server.auth import APIKeyMiddleware, DEFAULT_API_KEY, verify_api_key
+from sdk.server.schemas.exceptions import AuthenticationException
+
+
+class TestVerifyApiKey:
+    """Tests for API key verification."""
+
+    def test_valid_key(self):
+        """Test the configured key is accepted."""
+        assert verify_api_key(DEFAULT_API_KEY) is True
+
+    @pytest.mark.parametrize("api_key", [None, "", "wrong-key"])
+    def test_invalid_key(self, api_key):
+        """Test missing or wrong keys are rejected."""
+        with pytest.raises(AuthenticationException):
+            verify_api_key(api_key)
+
+
+class TestAPIKeyMiddleware:
+    """Tests for the API key middleware."""
+
+    @pytest.fixture
+    def client(self):
+        async def endpoint(request):
+            return PlainTextResponse("ok")
+
+        app = Starlette(routes=[
+            Route("/health", endpoint),
+            Route("/webhook/stripe", endpoint, methods=["POST"]),
+            Route("/process", endpoint, methods=["POST", "OPTIONS"]),
+        ])
+        app.add_middleware(
+            APIKeyMiddleware,
+            public_paths=("/health",),
+            public_prefixes=("/webhook/",)
+        )
+        return TestClient(app)
+
+    def test_rejects_before_endpoint(self, client):
+        """Test requests without a valid key get 401."""
+        response = client.post("/process", headers={"x-api-key": "wrong-key"})
+
+        assert response.status_code == 401
+        assert response.json() == {"detail": "Invalid API key"}
+
+    def test_accepts_valid_key(self, client):
+        """Test requests with the configured key reach the endpoint."""
+        response = client.post("/process", headers={"x-api-key": DEFAULT_API_KEY})
+
+        assert response.status_code == 200
+
+    @pytest.mark.parametrize("method,path", [
+        ("GET", "/health"),
+        ("POST", "/webhook/stripe"),
+        ("OPTIONS", "/process"),
+    ])
+    def test_public_paths_need_no_key(self, client, method, path):
+        """Test public paths, webhooks and preflight requests skip the check."""
+        assert client.request(method, path).status_code == 200
@@ -163,3 +163,17 @@ class TestConverterFactory:
         """Test getting Square converter."""
         converter = get_converter(PaymentGateway.SQUARE)
         assert isinstance(converter, SquareConverter)
+    
+    def test_converter_shared_per_gateway(self):
+        """Test the factory reuses one converter instance per gateway."""
+        assert get_converter(PaymentGateway.STRIPE) is get_converter(PaymentGateway.STRIPE)
+        assert get_converter(PaymentGateway.STRIPE) is not get_converter(PaymentGateway.SQUARE)
+    
+    def test_package_exports(self):
+        """Test converters are importable from the package on first access."""
+        import sdk.server.converters as converters
+        
+        assert converters.StripeConverter is StripeConverter
+        assert converters.get_converter is get_converter
+        with pytest.raises(AttributeError):
+            converters.UnknownConverter
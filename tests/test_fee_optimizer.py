@@ -0,0 +1,287 @@
+"""Tests for gateway fee calculation and selection."""
+
+import random
+
+import pytest
+from decimal import ROUND_HALF_UP, Decimal
+
+from sdk.server.schemas.schemas import PaymentGateway
+from sdk.server.fee_optimizer import (
+    GatewayFeeCalculator,
+    CardBrand,
+    card_brand_from_name,
+    detect_card_brand,
+    detect_card_brand_from_bin,
+    to_cents
+)
+from sdk.server.models import amount_to_cents
+
+
+class TestCalculateFees:
+    """Tests for per-gateway fee calculation."""
+
+    def test_fees_for_all_gateways(self):
+        """Test standard fees for a domestic Visa payment."""
+        fees = GatewayFeeCalculator.calculate_fees_for_all_gateways(
+            amount=Decimal("100.00"),
+            card_brand=CardBrand.VISA
+        )
+
+        assert fees[PaymentGateway.STRIPE] == Decimal("3.20")
+        assert fees[PaymentGateway.SQUARE] == Decimal("2.70")
+        assert fees[PaymentGateway.PAYPAL] == Decimal("3.98")
+
+    def test_amex_and_international_surcharges(self):
+        """Test surcharges are added to the percentage fee."""
+        fees = GatewayFeeCalculator.calculate_fees_for_all_gateways(
+            amount=Decimal("100.00"),
+            card_brand=CardBrand.AMEX,
+            is_international=True
+        )
+
+        assert fees[PaymentGateway.STRIPE] == Decimal("5.20")
+        assert fees[PaymentGateway.SQUARE] == Decimal("3.70")
+
+    def test_fee_in_cents(self):
+        """Test integer-cent fee calculation."""
+        stripe = GatewayFeeCalculator.FEE_STRUCTURES[PaymentGateway.STRIPE]
+
+        assert stripe.calculate_fee_cents(10000) == 320
+        assert stripe.calculate_fee_cents(10000, CardBrand.AMEX, True) == 520
+
+    def test_single_gateway_fee(self):
+        """Test the single-gateway fee matches the gateway's fee structure."""
+        square = GatewayFeeCalculator.FEE_STRUCTURES[PaymentGateway.SQUARE]
+
+        assert GatewayFeeCalculator.calculate_fee(
+            PaymentGateway.SQUARE,
+            amount=Decimal("19.99"),
+            card_brand=CardBrand.AMEX,
+            is_international=True
+        ) == square.calculate_fee(Decimal("19.99"), CardBrand.AMEX, True)
+
+    def test_fee_rounds_half_even(self):
+        """Test fee rounding matches Decimal quantize (half-to-even)."""
+        paypal = GatewayFeeCalculator.FEE_STRUCTURES[PaymentGateway.PAYPAL]
+
+        # 45375.00 * 4.98% + 0.49 = 2260.165
+        assert paypal.calculate_fee(Decimal("45375.00"), is_international=True) == Decimal("2260.16")
+
+    def test_sub_cent_amounts_match_decimal_math(self):
+        """Test sub-cent amounts are rounded like the stored amount, then priced exactly."""
+        rng = random.Random(1234)
+        amounts = [Decimal(rng.randint(1, 10_000_000)).scaleb(-3) for _ in range(500)]
+        
+        for gateway, structure in GatewayFeeCalculator.FEE_STRUCTURES.items():
+            for brand in (CardBrand.VISA, CardBrand.AMEX):
+                for is_international in (False, True):
+                    rate = structure.effective_percentage(brand, is_international)
+                    for amount in amounts:
+                        stored = amount.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+                        expected = (stored * rate + structure.fixed_fee).quantize(Decimal("0.01"))
+                        
+                        assert structure.calculate_fee(amount, brand, is_international) == expected
+    
+    def test_to_cents_matches_stored_amount(self):
+        """Test fee cents agree with the amount_cents stored for a transaction."""
+        for amount in ("10.005", "10.004", "6749.889", "0.015", "19.99"):
+            assert to_cents(Decimal(amount)) == amount_to_cents(Decimal(amount))
+
+    def test_fee_tables_match_fee_structures(self):
+        """Test the column layout gives the same rates as each fee structure."""
+        gateways = [PaymentGateway.PAYPAL, PaymentGateway.STRIPE]
+        tables = GatewayFeeCalculator._get_fee_tables(gateways)
+
+        assert tables.gateways == tuple(gateways)
+        assert tables.rate_units(CardBrand.AMEX, True) == tuple(
+            GatewayFeeCalculator.FEE_STRUCTURES[g].effective_rate_units(CardBrand.AMEX, True)
+            for g in gateways
+        )
+
+    def test_batch_matches_single_calculation(self):
+        """Test batch fees match the per-call calculation."""
+        amounts = [Decimal("0.50"), Decimal("19.99"), Decimal("100.00"), Decimal("1234.56")]
+
+        batch = GatewayFeeCalculator.calculate_fees_batch(
+            amounts,
+            card_brand=CardBrand.AMEX,
+            is_international=True
+        )
+
+        assert len(batch) == len(amounts)
+        for amount, fees in zip(amounts, batch):
+            assert fees == GatewayFeeCalculator.calculate_fees_for_all_gateways(
+                amount=amount,
+                card_brand=CardBrand.AMEX,
+                is_international=True
+            )
+
+
+class TestSelectCheapestGateway:
+    """Tests for cheapest gateway selection."""
+
+    def test_selects_lowest_fee(self):
+        """Test the gateway with the lowest fee is selected."""
+        gateway, fee, all_fees = GatewayFeeCalculator.select_cheapest_gateway(
+            amount=Decimal("100.00"),
+            card_brand=CardBrand.VISA
+        )
+
+        assert gateway == PaymentGateway.SQUARE
+        assert fee == Decimal("2.70")
+        assert len(all_fees) == 3
+
+    def test_preference_weight_changes_selection(self):
+        """Test preference weights are applied but the original fee is returned."""
+        gateway, fee, _ = GatewayFeeCalculator.select_cheapest_gateway(
+            amount=Decimal("100.00"),
+            card_brand=CardBrand.VISA,
+            preference_weight={PaymentGateway.SQUARE: Decimal("1.00")}
+        )
+
+        assert gateway == PaymentGateway.STRIPE
+        assert fee == Decimal("3.20")
+
+    def test_preference_weight_for_unavailable_gateway_ignored(self):
+        """Test weights for gateways outside the available set are ignored."""
+        gateway, fee, all_fees = GatewayFeeCalculator.select_cheapest_gateway(
+            amount=Decimal("100.00"),
+            available_gateways=[PaymentGateway.STRIPE, PaymentGateway.PAYPAL],
+            preference_weight={PaymentGateway.SQUARE: Decimal("-10.00")}
+        )
+
+        assert gateway == PaymentGateway.STRIPE
+        assert fee == Decimal("3.20")
+        assert PaymentGateway.SQUARE not in all_fees
+
+    def test_no_available_gateways(self):
+        """Test error when no gateways are available."""
+        with pytest.raises(ValueError):
+            GatewayFeeCalculator.select_cheapest_gateway(
+                amount=Decimal("100.00"),
+                available_gateways=[]
+            )
+
+
+class TestUpdateFeeStructure:
+    """Tests for updating gateway fee structures."""
+
+    def test_update_is_reflected_in_fees(self):
+        """Test updated rates are used by subsequent calculations."""
+        original = GatewayFeeCalculator.FEE_STRUCTURES[PaymentGateway.SQUARE]
+        GatewayFeeCalculator.calculate_fees_for_all_gateways(amount=Decimal("100.00"))
+
+        try:
+            GatewayFeeCalculator.update_fee_structure(
+                PaymentGateway.SQUARE,
+                percentage_fee=Decimal("0.01")
+            )
+            fees = GatewayFeeCalculator.calculate_fees_for_all_gateways(amount=Decimal("100.00"))
+
+            assert fees[PaymentGateway.SQUARE] == Decimal("1.10")
+            
+            # Rates finer than 10^-7 are rounded, not truncated
+            GatewayFeeCalculator.update_fee_structure(
+                PaymentGateway.SQUARE,
+                percentage_fee=Decimal("0.02599999999")
+            )
+            fees = GatewayFeeCalculator.calculate_fees_for_all_gateways(amount=Decimal("1000000.00"))
+            
+            assert fees[PaymentGateway.SQUARE] == Decimal("26000.10")
+        finally:
+            GatewayFeeCalculator.FEE_STRUCTURES[PaymentGateway.SQUARE] = original
+            GatewayFeeCalculator._fee_tables = None
+            GatewayFeeCalculator._calculate_fees_cached.cache_clear()
+
+
+class TestDetectCardBrand:
+    """Tests for card brand detection."""
+
+    @pytest.mark.parametrize("brand_hint,expected", [
+        ("Visa", CardBrand.VISA),
+        ("MasterCard", CardBrand.MASTERCARD),
+        ("American Express", CardBrand.AMEX),
+        ("amex", CardBrand.AMEX),
+        ("Discover", CardBrand.DISCOVER),
+    ])
+    def test_brand_from_hint(self, brand_hint, expected):
+        """Test brand detection from the payment token brand hint."""
+        assert detect_card_brand("tok_123", brand_hint) == expected
+
+    @pytest.mark.parametrize("token,expected", [
+        ("tok_visa_4242", CardBrand.VISA),
+        ("tok_mastercard", CardBrand.MASTERCARD),
+        ("tok_mc_4444", CardBrand.MASTERCARD),
+        ("tok_amex", CardBrand.AMEX),
+        ("tok_discover", CardBrand.DISCOVER),
+        ("tok_123", CardBrand.UNKNOWN),
+    ])
+    def test_brand_from_token(self, token, expected):
+        """Test brand detection from the token when no hint is usable."""
+        assert detect_card_brand(token, "unionpay") == expected
+
+    @pytest.mark.parametrize("card_bin,expected", [
+        ("424242", CardBrand.VISA),
+        ("555555", CardBrand.MASTERCARD),
+        ("222300", CardBrand.MASTERCARD),
+        ("378282", CardBrand.AMEX),
+        ("601111", CardBrand.DISCOVER),
+        ("650000", CardBrand.DISCOVER),
+        ("9999", CardBrand.UNKNOWN),
+        ("abc", CardBrand.UNKNOWN),
+    ])
+    def test_brand_from_bin(self, card_bin, expected):
+        """Test brand detection from the card BIN."""
+        assert detect_card_brand_from_bin(card_bin) == expected
+
+    @pytest.mark.parametrize("wire_name,expected", [
+        ("visa", CardBrand.VISA),
+        ("mastercard", CardBrand.MASTERCARD),
+        ("amex", CardBrand.AMEX),
+        ("unknown", CardBrand.UNKNOWN),
+    ])
+    def test_brand_from_wire_name(self, wire_name, expected):
+        """Test brands round-trip through their string form."""
+        assert CardBrand(wire_name) == expected
+        assert expected.wire_name == wire_name
+
+    def test_invalid_wire_name(self):
+        """Test unknown brand strings are rejected."""
+        with pytest.raises(ValueError):
+            CardBrand("unionpay")
+
+    @pytest.mark.parametrize("name,expected", [
+        ("Visa", CardBrand.VISA),
+        ("AMEX", CardBrand.AMEX),
+        ("unionpay", CardBrand.UNKNOWN),
+    ])
+    def test_brand_from_name(self, name, expected):
+        """Test brand names parse case-insensitively with an UNKNOWN fallback."""
+        assert card_brand_from_name(name) == expected
+
+    def test_brand_from_name_default(self):
+        """Test unknown names return the given default."""
+        assert card_brand_from_name("unionpay", CardBrand.VISA) == CardBrand.VISA
+
+    def test_bin_preferred_over_hint(self):
+        """Test a known BIN takes precedence over the brand hint."""
+        assert detect_card_brand("tok_visa", "visa", card_bin="378282") == CardBrand.AMEX
+
+
+class TestFeeComparison:
+    """Tests for the fee comparison report."""
+
+    def test_comparison_recommends_cheapest(self):
+        """Test recommendation and savings in the comparison."""
+        comparison = GatewayFeeCalculator.get_fee_comparison(
+            amount=Decimal("100.00"),
+            card_brand=CardBrand.VISA
+        )
+
+        assert comparison["card_brand"] == "visa"
+        assert set(comparison["fees"]) == {"stripe", "square", "paypal"}
+        assert comparison["fees"]["stripe"]["net_amount"] == 96.8
+        assert comparison["recommendation"]["gateway"] == "square"
+        assert comparison["recommendation"]["fee"] == 2.7
+        assert comparison["savings"]["vs_gateway"] == "paypal"
+        assert comparison["savings"]["amount"] == 1.28
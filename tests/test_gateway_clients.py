@@ -0,0 +1,646 @@
+"""Tests for payment gateway clients."""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import threading
+import time
+import pytest
+
+from sdk.server import gateway_clients, gateway_registry
+from sdk.server.schemas.schemas import PaymentGateway, PaymentStatus, GatewayNativeRequest
+from sdk.server.gateway_clients import (
+    BaseGatewayClient,
+    StripeClient,
+    PayPalClient,
+    SquareClient
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_idempotency_responses():
+    """Isolate tests from payment responses stored by idempotency key."""
+    yield
+    for responses in gateway_clients._idempotency_responses:
+        responses.clear()
+    for in_flight in gateway_clients._idempotency_in_flight:
+        in_flight.clear()
+
+
+class TestSharedHttpClient:
+    """Tests for the pooled HTTP client shared per gateway."""
+    
+    def test_client_shared_across_instances(self):
+        """Test instances of the same gateway reuse one HTTP client."""
+        async def run():
+            first = await PayPalClient()._get_http()
+            second = await PayPalClient(custom_api_key="other_key")._get_http()
+            
+            assert first is second
+            assert str(first.base_url).startswith("https://api-m.paypal.com")
+            
+            await BaseGatewayClient.close_http_clients()
+            assert first.is_closed
+            assert PaymentGateway.PAYPAL not in BaseGatewayClient._http_clients
+        
+        asyncio.run(run())
+    
+    def test_closed_client_is_recreated(self):
+        """Test a new HTTP client is created after shutdown."""
+        async def run():
+            client = PayPalClient()
+            first = await client._get_http()
+            await BaseGatewayClient.close_http_clients()
+            
+            second = await client._get_http()
+            assert second is not first
+            assert not second.is_closed
+            
+            await BaseGatewayClient.close_http_clients()
+        
+        asyncio.run(run())
+
+
+class TestSdkInitialization:
+    """Tests for gateway SDK setup."""
+    
+    def test_square_mock_mode_without_sdk(self, monkeypatch):
+        """Test Square falls back to mock mode when the SDK is unavailable."""
+        monkeypatch.setattr(gateway_clients, "SquareSDKClient", None)
+        
+        client = SquareClient()
+        
+        assert client.client is None
+        assert client.use_real_api is False
+    
+    def test_square_sdk_client_shared_per_token(self, monkeypatch):
+        """Test the registry shares one Square SDK client per access token."""
+        created = []
+        
+        def fake_sdk_client(access_token, environment):
+            created.append((access_token, environment))
+            return object()
+        
+        monkeypatch.setattr(gateway_clients, "SquareSDKClient", fake_sdk_client)
+        gateway_registry.clear_clients()
+        
+        try:
+            first = gateway_registry.get_client(PaymentGateway.SQUARE, "token_a")
+            second = gateway_registry.get_client(PaymentGateway.SQUARE, "token_a")
+            third = gateway_registry.get_client(PaymentGateway.SQUARE, "token_b")
+        finally:
+            gateway_registry.clear_clients()
+        
+        assert first.client is second.client
+        assert third.client is not first.client
+        assert [token for token, _ in created] == ["token_a", "token_b"]
+    
+    def test_square_sdk_clients_not_cached_by_token(self):
+        """Test Square keeps no class-level cache keyed by raw access tokens."""
+        assert not hasattr(SquareClient, "_sdk_clients")
+
+
+class TestGatewayRegistry:
+    """Tests for the process-wide gateway client registry."""
+    
+    def setup_method(self):
+        gateway_registry.clear_clients()
+    
+    def teardown_method(self):
+        gateway_registry.clear_clients()
+    
+    def test_client_reused_per_gateway_and_key(self):
+        """Test the same client is returned for the same gateway and key."""
+        default = gateway_registry.get_client(PaymentGateway.PAYPAL)
+        custom = gateway_registry.get_client(PaymentGateway.PAYPAL, "merchant_key")
+        
+        assert gateway_registry.get_client(PaymentGateway.PAYPAL) is default
+        assert gateway_registry.get_client(PaymentGateway.PAYPAL, "merchant_key") is custom
+        assert custom is not default
+        assert custom.api_key == "merchant_key"
+    
+    def test_cache_keys_do_not_hold_api_keys(self):
+        """Test API keys are hashed before being used as cache keys."""
+        gateway_registry.get_client(PaymentGateway.PAYPAL, "merchant_key")
+        
+        for _, key_digest in gateway_registry._clients:
+            assert key_digest != "merchant_key"
+    
+    def test_least_recently_used_client_evicted(self, monkeypatch):
+        """Test the cache is bounded."""
+        monkeypatch.setattr(gateway_registry, "CLIENT_CACHE_SIZE", 2)
+        
+        first = gateway_registry.get_client(PaymentGateway.PAYPAL, "key_1")
+        gateway_registry.get_client(PaymentGateway.PAYPAL, "key_2")
+        gateway_registry.get_client(PaymentGateway.PAYPAL, "key_3")
+        
+        assert len(gateway_registry._clients) == 2
+        assert gateway_registry.get_client(PaymentGateway.PAYPAL, "key_1") is not first
+
+
+class TestNormalizeResponse:
+    """Tests for gateway response normalization."""
+    
+    @pytest.mark.parametrize("client_class,response,expected", [
+        (StripeClient, {"id": "ch_1", "status": "succeeded"}, PaymentStatus.COMPLETED),
+        (StripeClient, {"id": "ch_1", "status": "requires_action"}, PaymentStatus.FAILED),
+        (PayPalClient, {"id": "PAY-1", "status": "PENDING"}, PaymentStatus.PENDING),
+        (SquareClient, {"payment": {"id": "sq_1", "status": "APPROVED"}}, PaymentStatus.AUTHORIZED),
+        (SquareClient, {"payment": {"id": "sq_1", "status": "CANCELED"}}, PaymentStatus.CANCELLED),
+    ])
+    def test_status_mapping(self, client_class, response, expected):
+        """Test gateway statuses map to normalized payment statuses."""
+        normalized = client_class().normalize_response(response)
+        
+        assert normalized["status"] == expected
+        assert normalized["raw_response"] is response
+
+
+class TestSquareMockPayment:
+    """Tests for the Square mock payment path."""
+    
+    @pytest.mark.parametrize("source_id,expected", [
+        ("cnon:card-nonce-ok", "VISA"),
+        ("cnon:MasterCard-ok", "MASTERCARD"),
+        ("cnon:amex-ok", "AMERICAN_EXPRESS"),
+        ("cnon:discover-ok", "DISCOVER"),
+    ])
+    def test_mock_card_brand(self, source_id, expected, monkeypatch):
+        """Test the mock card brand is derived from the source id."""
+        monkeypatch.setattr(gateway_clients, "SquareSDKClient", None)
+        request = GatewayNativeRequest(
+            gateway=PaymentGateway.SQUARE,
+            endpoint="/v2/payments",
+            payload={
+                "source_id": source_id,
+                "amount_money": {"amount": 1000, "currency": "USD"},
+                "idempotency_key": "key-123"
+            }
+        )
+        
+        response = asyncio.run(SquareClient().process_payment(request))
+        
+        payment = response["payment"]
+        assert payment["card_details"]["card"]["card_brand"] == expected
+        assert payment["created_at"] == payment["updated_at"]
+    
+    def test_mock_echoes_optional_fields(self, monkeypatch):
+        """Test set optional payload fields are copied into the mock payment."""
+        monkeypatch.setattr(gateway_clients, "SquareSDKClient", None)
+        request = GatewayNativeRequest(
+            gateway=PaymentGateway.SQUARE,
+            endpoint="/v2/payments",
+            payload={
+                "source_id": "cnon:ok",
+                "amount_money": {"amount": 1000, "currency": "USD"},
+                "idempotency_key": "key-123",
+                "reference_id": "order-42",
+                "note": "",
+                "autocomplete": False
+            }
+        )
+        
+        payment = asyncio.run(SquareClient().process_payment(request))["payment"]
+        
+        assert payment["reference_id"] == "order-42"
+        assert "note" not in payment
+        assert "customer_id" not in payment
+        assert payment["status"] == "APPROVED"
+
+
+class TestSigningKeyCache:
+    """Tests for the webhook signing key cache."""
+    
+    def setup_method(self):
+        gateway_clients._signing_key_cache.clear()
+    
+    def teardown_method(self):
+        gateway_clients._signing_key_cache.clear()
+    
+    def test_key_cached_until_ttl_expires(self, monkeypatch):
+        """Test the signing key is loaded once per TTL window."""
+        now = [1000.0]
+        monkeypatch.setattr(gateway_clients.time, "monotonic", lambda: now[0])
+        monkeypatch.setenv("SQUARE_WEBHOOK_SIGNATURE_KEY", "first_key")
+        client = SquareClient()
+        
+        assert client._get_signing_key() == b"first_key"
+        
+        monkeypatch.setenv("SQUARE_WEBHOOK_SIGNATURE_KEY", "rotated_key")
+        now[0] += gateway_clients.SIGNING_KEY_TTL_SECONDS - 1
+        assert client._get_signing_key() == b"first_key"
+        
+        now[0] += 1
+        assert client._get_signing_key() == b"rotated_key"
+    
+    def test_default_key_from_environment(self, monkeypatch):
+        """Test the default signing key is read from <GATEWAY>_WEBHOOK_SECRET."""
+        monkeypatch.setenv("PAYPAL_WEBHOOK_SECRET", "paypal_secret")
+        
+        assert PayPalClient()._get_signing_key() == b"paypal_secret"
+    
+    def test_missing_key(self, monkeypatch):
+        """Test None is returned when no signing key is configured."""
+        monkeypatch.delenv("PAYPAL_WEBHOOK_SECRET", raising=False)
+        
+        assert PayPalClient()._get_signing_key() is None
+
+
+class TestHmacSha256:
+    """Tests for the cached-key HMAC used by webhook verification."""
+    
+    @pytest.mark.parametrize("key", [b"", b"short", b"k" * 64, b"k" * 65, bytes(range(200))])
+    def test_matches_hmac_module(self, key):
+        """Test keys of every length give the standard HMAC-SHA256."""
+        body = b'{"id": "evt_123"}'
+        
+        assert gateway_clients._hmac_sha256(key, b"1700000000.", body) == hmac.new(
+            key, b"1700000000." + body, hashlib.sha256
+        ).digest()
+
+    
+    def test_throughput_probe_warns_when_slow(self, monkeypatch, caplog):
+        """Test the startup probe warns when SHA-256 is slower than the threshold."""
+        monkeypatch.setattr(gateway_clients, "SHA256_SLOW_NS_PER_BYTE", 0.0)
+        
+        with caplog.at_level("WARNING", logger=gateway_clients.logger.name):
+            assert gateway_clients.check_sha256_throughput() > 0
+        
+        assert "SHA extensions" in caplog.text
+
+class TestStripeWebhookVerification:
+    """Tests for Stripe webhook signature verification."""
+    
+    SECRET = "whsec_test_secret"
+    BODY = b'{"id": "evt_123", "type": "charge.succeeded"}'
+    
+    def setup_method(self):
+        gateway_clients._signing_key_cache.clear()
+    
+    def teardown_method(self):
+        gateway_clients._signing_key_cache.clear()
+    
+    def _sign(self, body, timestamp):
+        signed = f"{timestamp}.".encode() + body
+        return hmac.new(self.SECRET.encode(), signed, hashlib.sha256).hexdigest()
+    
+    def _verify(self, payload, signature):
+        return asyncio.run(StripeClient().verify_webhook(payload, signature))
+    
+    def test_valid_signature(self, monkeypatch):
+        """Test a correctly signed webhook is accepted."""
+        monkeypatch.setenv("STRIPE_WEBHOOK_SECRET", self.SECRET)
+        timestamp = int(time.time())
+        header = f"t={timestamp},v1=deadbeef,v1={self._sign(self.BODY, timestamp)}"
+        
+        assert self._verify(self.BODY, header) is True
+    
+    def test_tampered_body_rejected(self, monkeypatch):
+        """Test a signature over a different body is rejected."""
+        monkeypatch.setenv("STRIPE_WEBHOOK_SECRET", self.SECRET)
+        timestamp = int(time.time())
+        header = f"t={timestamp},v1={self._sign(self.BODY, timestamp)}"
+        
+        assert self._verify(self.BODY + b" ", header) is False
+    
+    def test_stale_timestamp_rejected(self, monkeypatch):
+        """Test signatures outside the tolerance window are rejected."""
+        monkeypatch.setenv("STRIPE_WEBHOOK_SECRET", self.SECRET)
+        timestamp = int(time.time()) - gateway_clients.STRIPE_WEBHOOK_TOLERANCE_SECONDS - 10
+        header = f"t={timestamp},v1={self._sign(self.BODY, timestamp)}"
+        
+        assert self._verify(self.BODY, header) is False
+    
+    @pytest.mark.parametrize("header", [None, "", "v1=abc", "t=notanumber,v1=abc"])
+    def test_malformed_header_rejected(self, header, monkeypatch):
+        """Test missing or malformed signature headers are rejected."""
+        monkeypatch.setenv("STRIPE_WEBHOOK_SECRET", self.SECRET)
+        
+        assert self._verify(self.BODY, header) is False
+    
+    def test_accepts_all_without_secret(self, monkeypatch):
+        """Test demo mode accepts webhooks when no secret is configured."""
+        monkeypatch.delenv("STRIPE_WEBHOOK_SECRET", raising=False)
+        
+        assert self._verify({"id": "evt_123"}, None) is True
+
+
+class TestSquareWebhookVerification:
+    """Tests for Square webhook signature verification."""
+    
+    KEY = "square_signature_key"
+    URL = "https://example.com/webhook/square"
+    BODY = b'{"merchant_id": "M123", "type": "payment.updated"}'
+    
+    @pytest.fixture(autouse=True)
+    def notification_url(self, monkeypatch):
+        monkeypatch.setenv("SQUARE_WEBHOOK_NOTIFICATION_URL", self.URL)
+        gateway_clients.reload_gateway_config()
+        yield
+        gateway_clients.reload_gateway_config()
+    
+    def setup_method(self):
+        gateway_clients._signing_key_cache.clear()
+    
+    def teardown_method(self):
+        gateway_clients._signing_key_cache.clear()
+    
+    def _sign(self, body, url=URL):
+        digest = hmac.new(self.KEY.encode(), url.encode() + body, hashlib.sha256).digest()
+        return base64.b64encode(digest).decode()
+    
+    def _verify(self, payload, signature):
+        return asyncio.run(SquareClient().verify_webhook(payload, signature))
+    
+    def test_valid_signature(self, monkeypatch):
+        """Test a correctly signed webhook is accepted."""
+        monkeypatch.setenv("SQUARE_WEBHOOK_SIGNATURE_KEY", self.KEY)
+        
+        assert self._verify(self.BODY, self._sign(self.BODY)) is True
+    
+    def test_tampered_body_rejected(self, monkeypatch):
+        """Test a signature over a different body is rejected."""
+        monkeypatch.setenv("SQUARE_WEBHOOK_SIGNATURE_KEY", self.KEY)
+        
+        assert self._verify(self.BODY + b" ", self._sign(self.BODY)) is False
+    
+    def test_other_notification_url_rejected(self, monkeypatch):
+        """Test a signature for a different notification URL is rejected."""
+        monkeypatch.setenv("SQUARE_WEBHOOK_SIGNATURE_KEY", self.KEY)
+        signature = self._sign(self.BODY, url="https://example.com/other")
+        
+        assert self._verify(self.BODY, signature) is False
+    
+    def test_missing_notification_url_rejected(self, monkeypatch):
+        """Test webhooks are rejected when the notification URL is not configured."""
+        monkeypatch.setenv("SQUARE_WEBHOOK_SIGNATURE_KEY", self.KEY)
+        monkeypatch.delenv("SQUARE_WEBHOOK_NOTIFICATION_URL")
+        gateway_clients.reload_gateway_config()
+        
+        assert self._verify(self.BODY, self._sign(self.BODY)) is False
+    
+    def test_memoryview_body_accepted(self, monkeypatch):
+        """Test a memoryview over the body is verified without copying."""
+        monkeypatch.setenv("SQUARE_WEBHOOK_SIGNATURE_KEY", self.KEY)
+        
+        assert self._verify(memoryview(self.BODY), self._sign(self.BODY)) is True
+    
+    def test_hex_signature_rejected(self, monkeypatch):
+        """Test a hex digest of the body alone is not accepted."""
+        monkeypatch.setenv("SQUARE_WEBHOOK_SIGNATURE_KEY", self.KEY)
+        signature = hmac.new(self.KEY.encode(), self.BODY, hashlib.sha256).hexdigest()
+        
+        assert self._verify(self.BODY, signature) is False
+    
+    @pytest.mark.parametrize("signature", [None, "", "deadbeef", "not-base64" * 4 + "abcd", "\u00e9" * 44])
+    def test_bad_signature_rejected(self, signature, monkeypatch):
+        """Test missing or wrong signatures are rejected."""
+        monkeypatch.setenv("SQUARE_WEBHOOK_SIGNATURE_KEY", self.KEY)
+        
+        assert self._verify(self.BODY, signature) is False
+    
+    def test_rotated_key_uses_new_prototype(self, monkeypatch):
+        """Test a rotated key is not verified against the old key's HMAC state."""
+        monkeypatch.setenv("SQUARE_WEBHOOK_SIGNATURE_KEY", self.KEY)
+        assert self._verify(self.BODY, self._sign(self.BODY)) is True
+        
+        gateway_clients._signing_key_cache.clear()
+        monkeypatch.setenv("SQUARE_WEBHOOK_SIGNATURE_KEY", "rotated_key")
+        
+        assert self._verify(self.BODY, self._sign(self.BODY)) is False
+    
+    def test_wrong_length_rejected_without_hashing(self, monkeypatch):
+        """Test signatures of the wrong length never reach the HMAC."""
+        monkeypatch.setenv("SQUARE_WEBHOOK_SIGNATURE_KEY", self.KEY)
+        monkeypatch.setattr(gateway_clients, "_hmac_sha256", None)
+        
+        assert self._verify(self.BODY, "ab" * 1000) is False
+    
+    def test_accepts_all_without_key(self, monkeypatch):
+        """Test demo mode accepts webhooks when no key is configured."""
+        monkeypatch.delenv("SQUARE_WEBHOOK_SIGNATURE_KEY", raising=False)
+        
+        assert self._verify({"merchant_id": "M123"}, None) is True
+    
+    def test_batch_matches_single_verification(self, monkeypatch):
+        """Test batch results line up with their webhooks."""
+        monkeypatch.setenv("SQUARE_WEBHOOK_SIGNATURE_KEY", self.KEY)
+        other = b'{"type": "refund.updated"}'
+        
+        results = asyncio.run(SquareClient().verify_webhook_batch(
+            [self.BODY, other, other],
+            [self._sign(self.BODY), self._sign(self.BODY), self._sign(other)]
+        ))
+        
+        assert results == [True, False, True]
+
+
+class TestSquareSdkPayment:
+    """Tests for the Square SDK payment path."""
+    
+    def test_create_payment_body(self, monkeypatch):
+        """Test only known optional fields are sent to the Square SDK."""
+        sent = {}
+        
+        class FakeResult:
+            body = {"payment": {"id": "sq_1", "status": "COMPLETED"}}
+            errors = None
+            
+            def is_success(self):
+                return True
+        
+        class FakePayments:
+            def create_payment(self, body):
+                sent.update(body)
+                sent["thread"] = threading.current_thread().name
+                return FakeResult()
+        
+        class FakeSdkClient:
+            def __init__(self, access_token, environment):
+                self.payments = FakePayments()
+        
+        monkeypatch.setattr(gateway_clients, "SquareSDKClient", FakeSdkClient)
+        monkeypatch.setenv("SQUARE_LOCATION_ID", "LOC_1")
+        gateway_clients.reload_gateway_config()
+        request = GatewayNativeRequest(
+            gateway=PaymentGateway.SQUARE,
+            endpoint="/v2/payments",
+            payload={
+                "source_id": "cnon:ok",
+                "amount_money": {"amount": 1000, "currency": "USD"},
+                "idempotency_key": "key-123",
+                "note": "order 42",
+                "unsupported_field": "dropped"
+            }
+        )
+        
+        asyncio.run(SquareClient().process_payment(request))
+        gateway_clients.reload_gateway_config()
+        
+        # The blocking SDK call runs on the gateway thread pool
+        assert sent.pop("thread").startswith("gw-")
+        assert sent == {
+            "source_id": "cnon:ok",
+            "amount_money": {"amount": 1000, "currency": "USD"},
+            "idempotency_key": "key-123",
+            "location_id": "LOC_1",
+            "note": "order 42"
+        }
+
+
+
+class TestGatewayConfig:
+    """Tests for cached gateway configuration."""
+    
+    def teardown_method(self):
+        gateway_clients.reload_gateway_config()
+    
+    def test_config_cached_until_reload(self, monkeypatch):
+        """Test environment changes apply after reload_gateway_config()."""
+        monkeypatch.setenv("PAYPAL_API_URL", "https://paypal.example")
+        gateway_clients.reload_gateway_config()
+        assert PayPalClient().base_url == "https://paypal.example"
+        
+        monkeypatch.setenv("PAYPAL_API_URL", "https://other.example")
+        assert PayPalClient().base_url == "https://paypal.example"
+        
+        gateway_clients.reload_gateway_config()
+        assert PayPalClient().base_url == "https://other.example"
+
+
+class TestOperationSupport:
+    """Tests for optional gateway operation support."""
+    
+    @pytest.mark.parametrize("operation", [
+        "refund_payment", "void_payment", "capture_payment", "setup_recurring_payment"
+    ])
+    def test_support_by_gateway(self, operation):
+        """Test only gateways overriding an operation report support for it."""
+        assert SquareClient().supports(operation) is True
+        assert StripeClient().supports(operation) is False
+        assert PayPalClient().supports(operation) is False
+    
+    def test_stub_still_raises(self):
+        """Test calling an unsupported operation directly still raises."""
+        with pytest.raises(NotImplementedError):
+            asyncio.run(PayPalClient().void_payment("PAY-1"))
+
+
+
+class TestIdempotency:
+    """Tests for replayed payments with the same idempotency key."""
+    
+    def _request(self, idempotency_key, amount=1000):
+        return GatewayNativeRequest(
+            gateway=PaymentGateway.SQUARE,
+            endpoint="/v2/payments",
+            payload={
+                "source_id": "cnon:ok",
+                "amount_money": {"amount": amount, "currency": "USD"},
+                "idempotency_key": idempotency_key
+            }
+        )
+    
+    def test_replay_returns_first_response(self, monkeypatch):
+        """Test a replayed idempotency key returns the stored response."""
+        monkeypatch.setattr(gateway_clients, "SquareSDKClient", None)
+        client = SquareClient()
+        
+        first = asyncio.run(client.process_payment(self._request("idem-1")))
+        replay = asyncio.run(client.process_payment(self._request("idem-1", amount=5000)))
+        other = asyncio.run(client.process_payment(self._request("idem-2", amount=5000)))
+        
+        assert replay == first
+        assert replay is not first
+        assert other["payment"]["amount_money"]["amount"] == 5000
+    
+    def test_concurrent_requests_charge_once(self):
+        """Test concurrent requests with one key wait for the first payment."""
+        calls = []
+        
+        class CountingClient(PayPalClient):
+            @gateway_clients._idempotent
+            async def process_payment(self, request):
+                calls.append(request)
+                await asyncio.sleep(0.01)
+                return {"id": f"PAY-{len(calls)}"}
+        
+        client = CountingClient()
+        
+        async def run():
+            return await asyncio.gather(
+                *(client.process_payment(self._request("idem-4")) for _ in range(3))
+            )
+        
+        responses = asyncio.run(run())
+        
+        assert len(calls) == 1
+        assert responses == [{"id": "PAY-1"}] * 3
+        assert len({id(response) for response in responses}) == 3
+    
+    def test_waiter_retries_after_failed_payment(self):
+        """Test a request waiting on a failed payment makes its own."""
+        calls = []
+        
+        class FlakyClient(PayPalClient):
+            @gateway_clients._idempotent
+            async def process_payment(self, request):
+                calls.append(request)
+                await asyncio.sleep(0.01)
+                if len(calls) == 1:
+                    raise RuntimeError("gateway timeout")
+                return {"id": "PAY-2"}
+        
+        client = FlakyClient()
+        
+        async def run():
+            return await asyncio.gather(
+                client.process_payment(self._request("idem-5")),
+                client.process_payment(self._request("idem-5")),
+                return_exceptions=True
+            )
+        
+        first, second = asyncio.run(run())
+        
+        assert isinstance(first, RuntimeError)
+        assert second == {"id": "PAY-2"}
+        assert len(calls) == 2
+    
+    def test_keys_scoped_by_api_key_digest(self):
+        """Test stored responses are keyed by a digest of the API key."""
+        client = PayPalClient(custom_api_key="merchant_key")
+        
+        asyncio.run(client.process_payment(self._request("idem-6")))
+        
+        for responses in gateway_clients._idempotency_responses:
+            for _, key_digest, _ in responses:
+                assert key_digest != "merchant_key"
+    
+    def test_key_from_headers(self):
+        """Test keys are also read from the idempotency headers."""
+        request = GatewayNativeRequest(
+            gateway=PaymentGateway.PAYPAL,
+            endpoint="/v2/checkout/orders",
+            payload={},
+            headers={"PayPal-Request-Id": "idem-3"}
+        )
+        
+        assert gateway_clients._request_idempotency_key(request) == "idem-3"
+    
+    def test_shard_is_bounded(self, monkeypatch):
+        """Test each shard evicts its oldest response when full."""
+        monkeypatch.setattr(gateway_clients, "_IDEMPOTENCY_SHARD_SIZE", 1)
+        monkeypatch.setattr(gateway_clients, "_IDEMPOTENCY_SHARDS", 1)
+        client = PayPalClient()
+        
+        async def run():
+            for key in ("a", "b"):
+                assert client._claim_idempotency(key) is None
+                client._settle_idempotency(key, {"id": key})
+            return client._claim_idempotency("b"), client._claim_idempotency("a")
+        
+        stored, evicted = asyncio.run(run())
+        
+        assert stored == {"id": "b"}
+        assert evicted is None
@@ -0,0 +1,67 @@
+"""Tests for shared ASGI middleware."""
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from sdk.server.middleware import BodySizeLimitMiddleware
+
+
+class TestBodySizeLimitMiddleware:
+    """Tests for the request body size limit."""
+
+    @pytest.fixture
+    def client(self):
+        async def endpoint(request):
+            body = await request.body()
+            return PlainTextResponse(str(len(body)))
+
+        app = Starlette(routes=[
+            Route("/process", endpoint, methods=["POST"]),
+            Route("/webhook/stripe", endpoint, methods=["POST"]),
+        ])
+        app.add_middleware(
+            BodySizeLimitMiddleware,
+            max_body_size=1000,
+            prefix_limits={"/webhook/": 4000}
+        )
+        return TestClient(app)
+
+    @staticmethod
+    def chunked(size):
+        """Yield a body in 500-byte chunks so no Content-Length is sent."""
+        for _ in range(size // 500):
+            yield b"x" * 500
+
+    def test_accepts_body_within_limit(self, client):
+        """Test bodies up to the limit reach the endpoint."""
+        response = client.post("/process", content=b"x" * 1000)
+
+        assert response.status_code == 200
+        assert response.text == "1000"
+
+    def test_rejects_declared_oversize_body(self, client):
+        """Test an oversize Content-Length gets 413."""
+        response = client.post("/process", content=b"x" * 1001)
+
+        assert response.status_code == 413
+        assert response.json() == {"detail": "Request body too large"}
+
+    def test_rejects_streamed_oversize_body(self, client):
+        """Test a chunked body is cut off once it crosses the limit."""
+        response = client.post("/process", content=self.chunked(2000))
+
+        assert response.status_code == 413
+
+    def test_prefix_limit(self, client):
+        """Test path prefixes get their own limit."""
+        assert client.post("/webhook/stripe", content=b"x" * 3000).status_code == 200
+        assert client.post("/webhook/stripe", content=self.chunked(5000)).status_code == 413
+
+    def test_invalid_content_length(self, client):
+        """Test a malformed Content-Length gets 400."""
+        response = client.post("/process", content=b"{}", headers={"content-length": "abc"})
+
+        assert response.status_code == 400
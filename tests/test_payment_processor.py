@@ -0,0 +1,126 @@
+"""Tests for the payment processor's transaction records."""
+
+import asyncio
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from sdk.server import gateway_clients, gateway_registry
+from sdk.server.models import Transaction
+from sdk.server.payment_processor import PaymentProcessor
+from sdk.server.schemas.database import Base
+from sdk.server.schemas.schemas import (
+    UniversalPaymentRequest,
+    PaymentGateway,
+    PaymentMethod,
+    PaymentStatus,
+    Customer,
+    PaymentToken
+)
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Session on a throwaway SQLite database with the transactions table."""
+    # Square in mock mode, so payments never leave the process
+    monkeypatch.setattr(gateway_clients, "SquareSDKClient", None)
+    gateway_registry.clear_clients()
+    
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'transactions.db'}",
+        # The processor runs its queries in worker threads
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, expire_on_commit=False)()
+    
+    yield session
+    
+    session.close()
+    engine.dispose()
+    gateway_registry.clear_clients()
+    for responses in gateway_clients._idempotency_responses:
+        responses.clear()
+
+
+def _payment_request(idempotency_key=None):
+    return UniversalPaymentRequest(
+        amount=Decimal("25.00"),
+        payment_method=PaymentMethod.CARD,
+        customer=Customer(email="test@example.com", name="Test User"),
+        payment_token=PaymentToken(token="cnon:card-nonce-ok"),
+        idempotency_key=idempotency_key
+    )
+
+
+def _transaction_count(db):
+    return db.execute(select(func.count()).select_from(Transaction)).scalar_one()
+
+
+class TestIdempotentPayments:
+    """Tests for payments replayed with the same idempotency key."""
+    
+    def test_replay_returns_original_transaction(self, db):
+        """Test a replayed key returns the first transaction without a new row."""
+        processor = PaymentProcessor(PaymentGateway.SQUARE, db)
+        
+        first = asyncio.run(processor.process_payment(_payment_request("k1")))
+        replay = asyncio.run(processor.process_payment(_payment_request("k1")))
+        
+        assert replay.transaction_id == first.transaction_id
+        assert replay.gateway_transaction_id == first.gateway_transaction_id
+        assert replay.status == first.status
+        assert replay.amount == first.amount
+        assert _transaction_count(db) == 1
+    
+    def test_payments_without_key_are_separate(self, db):
+        """Test requests without an idempotency key each get a transaction."""
+        processor = PaymentProcessor(PaymentGateway.SQUARE, db)
+        
+        first = asyncio.run(processor.process_payment(_payment_request()))
+        second = asyncio.run(processor.process_payment(_payment_request()))
+        
+        assert first.transaction_id != second.transaction_id
+        assert _transaction_count(db) == 2
+    
+    def test_concurrent_insert_returns_pending_transaction(self, db):
+        """Test losing the insert race to the same key returns that transaction."""
+        processor = PaymentProcessor(PaymentGateway.SQUARE, db)
+        processor._insert_pending_transaction("tx-first", _payment_request("k2"))
+        
+        assert processor._insert_pending_transaction("tx-second", _payment_request("k2")) is None
+        
+        existing = processor._get_idempotent_transaction("k2")
+        response = processor._replayed_response(existing, _payment_request("k2"))
+        
+        assert response.transaction_id == "tx-first"
+        assert response.status == PaymentStatus.PENDING
+        assert _transaction_count(db) == 1
+
+
+class TestWebhookStatusUpdate:
+    """Tests for transaction status changes from webhook events."""
+    
+    def test_event_updates_transaction_status(self, db, monkeypatch):
+        """Test a webhook event sets the status of the matching transaction."""
+        # No signature key configured, so the mock webhook is accepted
+        monkeypatch.delenv("SQUARE_WEBHOOK_SIGNATURE_KEY", raising=False)
+        gateway_clients._signing_key_cache.clear()
+        processor = PaymentProcessor(PaymentGateway.SQUARE, db)
+        payment = asyncio.run(processor.process_payment(_payment_request()))
+        payload = (
+            b'{"type": "payment.failed", "transaction_id": "'
+            + payment.gateway_transaction_id.encode()
+            + b'"}'
+        )
+        
+        asyncio.run(processor.handle_webhook(payload))
+        
+        status = db.execute(
+            select(Transaction.status)
+            .where(Transaction.transaction_id == payment.transaction_id)
+        ).scalar_one()
+        assert payment.status == PaymentStatus.COMPLETED
+        assert status == PaymentStatus.FAILED.value
@@ -12,27 +12,49 @@ from sdk.server.schemas.schemas import (
     BankAccountDetails,
     Address
 )
+from sdk.server.schemas import schemas as schemas_module
 from pydantic import ValidationError
 
 
+# Card payment request body as a client would send it
+CARD_PAYMENT_JSON = (
+    b'{"amount": "100.00", "currency": "USD", "payment_method": "card",'
+    b' "customer": {"email": "test@example.com", "name": "Test User"},'
+    b' "payment_token": {"token": "tok_visa_4242", "token_type": "card", "brand": "visa"}}'
+)
+
+
+# Module-scoped: no test mutates these, so one instance is validated per run
+@pytest.fixture(scope="module")
+def base_customer():
+    """Customer shared by the payment request tests."""
+    return Customer(email="test@example.com", name="Test User")
+
+
+@pytest.fixture(scope="module")
+def base_token():
+    """Card payment token shared by the payment request tests."""
+    return PaymentToken(
+        token="tok_visa_4242",
+        token_type="card",
+        last4="4242",
+        brand="visa",
+        exp_month=12,
+        exp_year=2025
+    )
+
+
 class TestUniversalPaymentRequest:
     """Tests for UniversalPaymentRequest schema."""
     
-    def test_valid_card_payment(self):
+    def test_valid_card_payment(self, base_customer, base_token):
         """Test valid card payment request with payment token."""
         request = UniversalPaymentRequest(
             amount=Decimal("100.00"),
             currency=Currency.USD,
             payment_method=PaymentMethod.CARD,
-            customer=Customer(email="test@example.com", name="Test User"),
-            payment_token=PaymentToken(
-                token="tok_visa_4242",
-                token_type="card",
-                last4="4242",
-                brand="visa",
-                exp_month=12,
-                exp_year=2025
-            )
+            customer=base_customer,
+            payment_token=base_token
         )
         
         assert request.amount == Decimal("100.00")
@@ -40,24 +62,29 @@ class TestUniversalPaymentRequest:
         assert request.payment_method == PaymentMethod.CARD
         assert request.payment_token.token == "tok_visa_4242"
     
-    def test_card_payment_without_payment_token(self):
-        """Test that card payment requires payment token."""
+    def test_card_payment_from_json(self):
+        """Test a card payment request validated straight from JSON."""
+        request = UniversalPaymentRequest.model_validate_json(CARD_PAYMENT_JSON)
+        
+        assert request.amount == Decimal("100.00")
+        assert request.currency == Currency.USD
+        assert request.payment_method == PaymentMethod.CARD
+        assert request.payment_token.token == "tok_visa_4242"
+    
+    def test_invalid_amount_from_json(self):
+        """Test that amount must be positive when validated from JSON."""
         with pytest.raises(ValidationError):
-            UniversalPaymentRequest(
-                amount=Decimal("100.00"),
-                currency=Currency.USD,
-                payment_method=PaymentMethod.CARD,
-                customer=Customer(email="test@example.com", name="Test User"),
-                payment_token=None
+            UniversalPaymentRequest.model_validate_json(
+                CARD_PAYMENT_JSON.replace(b'"100.00"', b'"-10.00"')
             )
     
-    def test_bank_account_payment(self):
+    def test_bank_account_payment(self, base_customer):
         """Test valid bank account payment request."""
         request = UniversalPaymentRequest(
             amount=Decimal("100.00"),
             currency=Currency.USD,
             payment_method=PaymentMethod.BANK_ACCOUNT,
-            customer=Customer(email="test@example.com", name="Test User"),
+            customer=base_customer,
             bank_account_details=BankAccountDetails(
                 account_number="123456789",
                 routing_number="987654321",
@@ -68,47 +95,50 @@ class TestUniversalPaymentRequest:
         assert request.payment_method == PaymentMethod.BANK_ACCOUNT
         assert request.bank_account_details is not None
     
-    def test_invalid_amount(self):
-        """Test that amount must be positive."""
-        with pytest.raises(ValidationError):
-            UniversalPaymentRequest(
-                amount=Decimal("-10.00"),
-                currency=Currency.USD,
-                payment_method=PaymentMethod.CARD,
-                customer=Customer(email="test@example.com", name="Test User"),
-                payment_token=PaymentToken(
-                    token="tok_visa_4242",
-                    token_type="card"
-                )
-            )
+    @pytest.mark.parametrize("overrides,error_field", [
+        ({"payment_token": None}, "payment_token"),
+        ({"amount": Decimal("-10.00")}, "amount"),
+    ])
+    def test_invalid_card_payment(self, base_customer, base_token, overrides, error_field):
+        """Test card payments need a token and a positive amount."""
+        fields = {
+            "amount": Decimal("100.00"),
+            "currency": Currency.USD,
+            "payment_method": PaymentMethod.CARD,
+            "customer": base_customer,
+            "payment_token": base_token,
+            **overrides
+        }
+        
+        with pytest.raises(ValidationError) as exc_info:
+            UniversalPaymentRequest(**fields)
+        
+        assert [error["loc"] for error in exc_info.value.errors()] == [(error_field,)]
 
 
 class TestPaymentToken:
     """Tests for PaymentToken schema."""
     
-    def test_valid_payment_token(self):
-        """Test valid payment token."""
-        token = PaymentToken(
-            token="tok_visa_4242",
-            token_type="card",
-            last4="4242",
-            brand="visa",
-            exp_month=12,
-            exp_year=2025
-        )
+    @pytest.mark.parametrize("fields,expected", [
+        (
+            {"token": "tok_visa_4242", "token_type": "card", "last4": "4242",
+             "brand": "visa", "exp_month": 12, "exp_year": 2025},
+            {"token": "tok_visa_4242", "last4": "4242", "brand": "visa"}
+        ),
+        # Minimal required fields; token_type defaults to card
+        ({"token": "tok_test_12345"}, {"token": "tok_test_12345", "token_type": "card"}),
+    ])
+    def test_valid_payment_token(self, fields, expected):
+        """Test valid payment tokens, full and minimal."""
+        token = PaymentToken(**fields)
         
-        assert token.token == "tok_visa_4242"
-        assert token.last4 == "4242"
-        assert token.brand == "visa"
+        for name, value in expected.items():
+            assert getattr(token, name) == value
     
-    def test_minimal_payment_token(self):
-        """Test payment token with minimal required fields."""
-        token = PaymentToken(
-            token="tok_test_12345"
-        )
-        
-        assert token.token == "tok_test_12345"
-        assert token.token_type == "card"  # Default value
+    def test_payment_token_is_frozen(self, base_token):
+        """Test nested value models reject mutation after validation."""
+        with pytest.raises(ValidationError):
+            base_token.token = "tok_other"
 
 
 class TestCardDetails:
@@ -116,35 +146,26 @@ class TestCardDetails:
     
     def test_card_details_not_available(self):
         """Test that CardDetails is no longer available."""
-        with pytest.raises(ImportError):
-            from sdk.server.schemas.schemas import CardDetails
+        assert not hasattr(schemas_module, "CardDetails")
 
 
 class TestAddress:
     """Tests for Address schema."""
     
-    def test_valid_address(self):
-        """Test valid address."""
-        address = Address(
-            line1="123 Main St",
-            city="New York",
-            postal_code="10001",
-            country="US"
-        )
-        
-        assert address.line1 == "123 Main St"
-        assert address.city == "New York"
-    
-    def test_address_with_optional_fields(self):
-        """Test address with optional fields."""
-        address = Address(
-            line1="123 Main St",
-            line2="Apt 4",
-            city="New York",
-            state="NY",
-            postal_code="10001",
-            country="US"
-        )
+    @pytest.mark.parametrize("fields,expected", [
+        (
+            {"line1": "123 Main St", "city": "New York", "postal_code": "10001", "country": "US"},
+            {"line1": "123 Main St", "city": "New York"}
+        ),
+        (
+            {"line1": "123 Main St", "line2": "Apt 4", "city": "New York", "state": "NY",
+             "postal_code": "10001", "country": "US"},
+            {"line2": "Apt 4", "state": "NY"}
+        ),
+    ])
+    def test_valid_address(self, fields, expected):
+        """Test valid addresses, with and without optional fields."""
+        address = Address(**fields)
         
-        assert address.line2 == "Apt 4"
-        assert address.state == "NY"
+        for name, value in expected.items():
+            assert getattr(address, name) == value
@@ -0,0 +1,80 @@
+"""Tests for the webhook endpoint."""
+
+import base64
+import hashlib
+import hmac
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from sdk.server import gateway_clients
+from sdk.server.main import app
+from sdk.server.schemas.database import get_db
+
+
+class TestWebhookEndpoint:
+    """Tests for signature handling in POST /webhook/{gateway}."""
+    
+    STRIPE_SECRET = "whsec_test_secret"
+    SQUARE_KEY = "square_signature_key"
+    SQUARE_URL = "https://example.com/webhook/square"
+    BODY = b'{"id": "evt_123", "type": "charge.succeeded"}'
+    
+    @pytest.fixture
+    def client(self):
+        # Events without a transaction_id never touch the database
+        app.dependency_overrides[get_db] = lambda: None
+        gateway_clients._signing_key_cache.clear()
+        yield TestClient(app)
+        gateway_clients._signing_key_cache.clear()
+        gateway_clients.reload_gateway_config()
+        app.dependency_overrides.clear()
+    
+    def _stripe_header(self, body):
+        timestamp = int(time.time())
+        signed = f"{timestamp}.".encode() + body
+        digest = hmac.new(self.STRIPE_SECRET.encode(), signed, hashlib.sha256).hexdigest()
+        return f"t={timestamp},v1={digest}"
+    
+    def test_stripe_signature_header(self, client, monkeypatch):
+        """Test a signed Stripe webhook is verified from Stripe-Signature."""
+        monkeypatch.setenv("STRIPE_WEBHOOK_SECRET", self.STRIPE_SECRET)
+        
+        response = client.post(
+            "/webhook/stripe",
+            content=self.BODY,
+            headers={"Stripe-Signature": self._stripe_header(self.BODY)}
+        )
+        
+        assert response.status_code == 200
+        assert response.json()["status"] == "success"
+    
+    def test_stripe_signature_in_generic_header_rejected(self, client, monkeypatch):
+        """Test a Stripe signature is not read from X-Signature."""
+        monkeypatch.setenv("STRIPE_WEBHOOK_SECRET", self.STRIPE_SECRET)
+        
+        response = client.post(
+            "/webhook/stripe",
+            content=self.BODY,
+            headers={"X-Signature": self._stripe_header(self.BODY)}
+        )
+        
+        assert response.status_code == 400
+    
+    def test_square_signature_header(self, client, monkeypatch):
+        """Test a signed Square webhook is verified from x-square-hmacsha256-signature."""
+        monkeypatch.setenv("SQUARE_WEBHOOK_SIGNATURE_KEY", self.SQUARE_KEY)
+        monkeypatch.setenv("SQUARE_WEBHOOK_NOTIFICATION_URL", self.SQUARE_URL)
+        gateway_clients.reload_gateway_config()
+        digest = hmac.new(
+            self.SQUARE_KEY.encode(), self.SQUARE_URL.encode() + self.BODY, hashlib.sha256
+        ).digest()
+        
+        response = client.post(
+            "/webhook/square",
+            content=self.BODY,
+            headers={"X-Square-HmacSha256-Signature": base64.b64encode(digest).decode()}
+        )
+        
+        assert response.status_code == 200